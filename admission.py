@@ -0,0 +1,114 @@
+"""
+Admission Control
+Caps concurrent /ask streams with a bounded, time-limited wait queue
+"""
+
+import asyncio
+from collections import deque
+from typing import Dict
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot get a slot; carries a Retry-After hint"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot. release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+
+class AdmissionController:
+    """
+    FIFO admission gate.
+
+    Up to `max_concurrent` holders run at once; up to `max_queue` more
+    wait in arrival order for at most `queue_timeout` seconds. Anything
+    beyond that is rejected immediately.
+    """
+
+    def __init__(self, max_concurrent: int = 64, max_queue: int = 128,
+                 queue_timeout: float = 10.0, retry_after: int = 5):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Ticket:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return Ticket(self)
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("queue full", self.retry_after)
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+
+        def expire():
+            if not waiter.done():
+                self.timed_out += 1
+                waiter.set_exception(AdmissionRejected("queue wait timeout", self.retry_after))
+
+        timer = loop.call_later(self.queue_timeout, expire)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # A slot handed over just as the waiter was cancelled must go back
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release()
+            raise
+        finally:
+            timer.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+        self.admitted += 1
+        return Ticket(self)
+
+    def _release(self) -> None:
+        # Hand the slot straight to the oldest live waiter, if any
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def status(self) -> Dict:
+        return {
+            "active": self.active,
+            "limit": self.max_concurrent,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
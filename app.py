@@ -1,15 +1,17 @@
 print(">>> IMPORT START <<<")
 
 from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse
+from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import time
 import json
+import asyncio
 import os
 import sys
 import uuid
+import weakref
 import logging
 import re
 import traceback
@@ -17,12 +19,31 @@ from functools import wraps
 from html import escape
 from datetime import timedelta
 from logging.handlers import RotatingFileHandler
-from typing import Generator, Optional
+from typing import AsyncGenerator, Optional
 
 print(">>> FASTAPI IMPORTS OK <<<")
 
-from groq_client import groq_response_streaming
-from web_search import search_web, fetch_page
+import groq_client
+import web_search
+import fetch_client
+from groq_client import StreamInterrupted, groq_response_streaming_async
+from web_search import SearchOverloaded, search_web_async, fetch_pages_async
+from streaming import (
+    sse_event,
+    coalesce_tokens,
+    StreamStats,
+    Flight,
+    SingleFlight,
+    ClientDisconnected,
+    cancel_on_disconnect,
+    SSE_STREAMS
+)
+import metrics
+from cache import TTLCache, normalize_query
+from admission import AdmissionController, AdmissionRejected
+from model_router import router
+from prompt_builder import build_prompt
+from conversation import ChatContext, memory
 from response_formatter import format_response
 from response_quality import check_response
 from connectivity import check_connectivity, is_online
@@ -37,7 +58,8 @@ from auth import (
 )
 from database import (
     init_db,
-    save_message,
+    queue_message,
+    persistence_queue,
     get_chat_list,
     get_chat_history,
     delete_chat
@@ -67,6 +89,15 @@ class Config:
         'ALLOWED_ORIGINS': (str, ''),
         'RATE_LIMIT_ENABLED': (bool, True),
         'RENDER_EXTERNAL_URL': (str, ''),
+        'BROWSE_CANDIDATES': (int, 5),
+        'BROWSE_SOURCES': (int, 3),
+        'ANSWER_CACHE_SIZE': (int, 256),
+        'ANSWER_CACHE_TTL': (int, 600),
+        'MAX_CONCURRENT_STREAMS': (int, 64),
+        'MAX_QUEUED_STREAMS': (int, 128),
+        'QUEUE_WAIT_TIMEOUT': (float, 10.0),
+        'ADMISSION_RETRY_AFTER': (int, 5),
+        'SSE_TIMING_EVENT': (bool, False),
     }
     
     @classmethod
@@ -233,6 +264,35 @@ logger.info(f"Mode: [GROQ - Ultra-Fast Cloud Inference]")
 
 print(">>> CONNECTIVITY OK <<<")
 
+# Browsing answers keyed on the normalized question; a hit skips search and Groq
+answer_cache = TTLCache(
+    max_entries=config['ANSWER_CACHE_SIZE'],
+    ttl=config['ANSWER_CACHE_TTL']
+)
+
+# Identical browsing questions already being answered share one upstream pipeline
+inflight = SingleFlight()
+
+# Bounded concurrency for /ask streams; overflow waits briefly, then gets a 503
+admission = AdmissionController(
+    max_concurrent=config['MAX_CONCURRENT_STREAMS'],
+    max_queue=config['MAX_QUEUED_STREAMS'],
+    queue_timeout=config['QUEUE_WAIT_TIMEOUT'],
+    retry_after=config['ADMISSION_RETRY_AFTER']
+)
+
+# =========================
+# METRICS
+# =========================
+ASK_REQUESTS = metrics.counter("ask_requests_total", "/ask requests by path", ("path",))
+ASK_FIRST_FRAME_SECONDS = metrics.histogram(
+    "ask_first_text_seconds", "Time from /ask arrival to first text frame", ("path",)
+)
+ASK_STREAM_SECONDS = metrics.histogram("ask_stream_seconds", "Full /ask stream duration", ("path",))
+metrics.gauge("admission_active_streams", "Streams holding an admission slot", fn=lambda: admission.active)
+metrics.gauge("admission_queue_depth", "Requests waiting for an admission slot", fn=lambda: admission.queue_depth)
+metrics.gauge("inflight_browsing_pipelines", "Distinct browsing pipelines running", fn=lambda: len(inflight))
+
 # =========================
 # UTILITY FUNCTIONS
 # =========================
@@ -248,6 +308,91 @@ def is_browsing_query(text: str) -> bool:
     """Determine if a query needs web search (opposite of is_short_conversational)"""
     return not is_short_conversational(text)
 
+async def _answer_events(user_input: str, cache_key: Optional[str] = None,
+                         context: Optional[ChatContext] = None):
+    """
+    Upstream answer pipeline, independent of any one client.
+    Passing a cache_key marks a browsing query (search + sources) whose
+    answer is stored in the answer cache once complete. `context` is the
+    chat's summary and recent turns, added to the prompt within budget.
+    Yields ('text', chunk) for model output and ('notice', text) for
+    fallback messages that should be shown but not persisted. A stream
+    cut off after its first token yields ('error', text) and is never
+    cached, so a truncated answer is not replayed to later askers.
+    """
+    timings = {}
+    category = router.classifier.classify(user_input)
+    model = router.route(user_input, category=category)
+    timings["model"] = model
+    history = {"summary": context.summary, "history": context.turns} if context else {}
+
+    if cache_key is None:
+        built = build_prompt(user_input, model=model, category=category, **history)
+    else:
+        stage = time.perf_counter()
+        try:
+            search_results = await search_web_async(
+                user_input, max_results=config['BROWSE_CANDIDATES']
+            )
+        except SearchOverloaded:
+            yield ('notice', "Web search is busy right now. Please try again in a moment.")
+            yield ('timing', timings)
+            return
+        timings["search_s"] = round(time.perf_counter() - stage, 3)
+
+        if not search_results:
+            yield ('notice', "I couldn't find relevant information.")
+            yield ('timing', timings)
+            return
+
+        stage = time.perf_counter()
+        urls = [r.get("url") or r.get("link") for r in search_results]
+        pages = await fetch_pages_async(
+            [u for u in urls if u], want=config['BROWSE_SOURCES']
+        )
+        timings["fetch_s"] = round(time.perf_counter() - stage, 3)
+        timings["sources"] = len(pages)
+
+        if not pages:
+            yield ('notice', "I found sources but couldn't extract content.")
+            yield ('timing', timings)
+            return
+
+        titles = {r.get("url") or r.get("link"): r.get("title", "") for r in search_results}
+        built = build_prompt(
+            user_input,
+            model=model,
+            category=category,
+            sources=[(titles.get(url, ""), content) for url, content in pages],
+            template="Answer using these sources:\n{context}\n\nQuestion: {question}",
+            **history,
+        )
+        logger.info("[GROQ] starting streaming for browsing query")
+
+    timings.update(built.stats())
+
+    stage = time.perf_counter()
+    chunks = []
+    completed = False
+    stream = groq_response_streaming_async(built.prompt, model=model, max_tokens=built.max_tokens)
+    try:
+        async for chunk in coalesce_tokens(stream):
+            if not chunks:
+                timings["first_token_s"] = round(time.perf_counter() - stage, 3)
+            chunks.append(chunk)
+            yield ('text', chunk)
+        completed = True
+    except StreamInterrupted as e:
+        logger.warning(f"[GROQ] {e}")
+        yield ('error', 'The answer was interrupted. Please try again.')
+    timings["generate_s"] = round(time.perf_counter() - stage, 3)
+
+    if not chunks:
+        yield ('notice', '[Groq API not available]')
+    elif cache_key and completed:
+        answer_cache.set(cache_key, chunks)
+    yield ('timing', timings)
+
 print(">>> UTILITY FUNCTIONS OK <<<")
 
 # =========================
@@ -268,6 +413,8 @@ async def ask(req: Request):
     """Streaming POST endpoint - returns SSE stream for frontend consumption"""
     logger.info(">>> /ask HIT (POST) <<<")
 
+    ticket = None
+    handed_off = False
     try:
         raw_body = await req.body()
         try:
@@ -275,7 +422,7 @@ async def ask(req: Request):
         except Exception:
             logger.warning("[ASK] Invalid JSON body received")
             def error_gen():
-                yield f"data: {json.dumps({'type': 'error', 'text': 'Invalid JSON'})}\n\n"
+                yield sse_event('error', 'Invalid JSON')
             return StreamingResponse(error_gen(), media_type="text/event-stream")
 
         user_input = sanitize_input(data.get("message", ""), max_length=5000)
@@ -283,86 +430,155 @@ async def ask(req: Request):
 
         if not user_input:
             def empty_gen():
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield sse_event('done')
             return StreamingResponse(empty_gen(), media_type="text/event-stream")
 
+        try:
+            ticket = await admission.acquire()
+        except AdmissionRejected as e:
+            logger.warning(f"[ADMISSION] Rejected /ask ({e.reason}), queue depth {admission.queue_depth}")
+            return JSONResponse(
+                {"error": "Server busy, please retry shortly", "reason": e.reason},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+        # Only admitted requests read memory, and before this message is
+        # queued, so it isn't included twice
         user_id = 0
-        save_message(chat_id, user_id, "user", user_input)
+        context = await asyncio.to_thread(memory.load, chat_id, user_id)
+
+        send_timing = config['SSE_TIMING_EVENT'] or bool(data.get("timing"))
+        queue_message(chat_id, user_id, "user", user_input)
         logger.info(f"[ASK] Input: {user_input}")
 
-        def generate() -> Generator[str, None, None]:
-            """Generator for streaming SSE response"""
+        async def generate() -> AsyncGenerator[str, None]:
+            """Async generator for streaming SSE response (no threadpool thread held)"""
+            stats = StreamStats()
+            received = time.perf_counter()
+            path = "conversational" if is_short_conversational(user_input) else "browsing"
+            outcome = "error"
+            timings = {}
+
+            def emit(event_type, text=None, **fields):
+                return stats.record(sse_event(event_type, text, **fields))
+
             try:
                 # Immediate heartbeat
-                yield f"data: {json.dumps({'type': 'status', 'text': '[stream open]'})}\n\n"
+                yield emit('status', '[stream open]')
                 
                 # 🚀 FAST PATH — NO BROWSING
-                if is_short_conversational(user_input):
+                if path == "conversational":
                     logger.info("[ASK] Conversational -> Groq only")
-                    stream = groq_response_streaming(user_input)
-                    if stream is None:
-                        yield f"data: {json.dumps({'type': 'text', 'text': '[Groq API not available]'})}\n\n"
-                    else:
-                        full_text = ""
-                        for chunk in stream:
-                            logger.info(f"[GROQ] chunk: {chunk}")
-                            full_text += chunk
-                            yield f"data: {json.dumps({'type': 'text', 'text': chunk})}\n\n"
-                        if full_text:
-                            save_message(chat_id, user_id, "assistant", full_text)
+                    events = Flight(_answer_events(user_input, context=context)).stream()
                 else:
                     # 🌍 BROWSING PATH
                     logger.info("[ASK] Browsing query detected")
-                    search_results = search_web(user_input, max_results=3)
-
-                    if not search_results:
-                        msg = "I couldn't find relevant information."
-                        yield f"data: {json.dumps({'type': 'text', 'text': msg})}\n\n"
+                    cache_key = normalize_query(user_input)
+                    if context:
+                        # Answers depend on the conversation; only share them within identical context
+                        cache_key = f"{cache_key}|{context.digest}"
+                    cached = answer_cache.get(cache_key)
+                    if cached is not None:
+                        logger.info("[CACHE] Answer cache hit - replaying")
+                        path = "cache"
+                        for chunk in cached:
+                            yield emit('text', chunk)
+                        queue_message(chat_id, user_id, "assistant", "".join(cached))
+                        if send_timing:
+                            yield emit('timing', timings={"total_s": round(time.perf_counter() - received, 3)})
+                        yield emit('done')
+                        outcome = "completed"
+                        return
+
+                    flight, leader = inflight.join(
+                        cache_key, lambda: _answer_events(user_input, cache_key, context)
+                    )
+                    if not leader:
+                        logger.info("[ASK] Joined in-flight request for the same question")
+                        path = "merged"
+                    events = flight.stream()
+
+                chunks = []
+                failed = False
+                async for kind, text in cancel_on_disconnect(events, req):
+                    if kind == 'text':
+                        if not chunks:
+                            ASK_FIRST_FRAME_SECONDS.observe(time.perf_counter() - received, path=path)
+                        chunks.append(text)
+                        yield emit('text', text)
+                    elif kind == 'notice':
+                        yield emit('text', text)
+                    elif kind == 'timing':
+                        timings = text
                     else:
-                        extracted = []
-                        for r in search_results:
-                            try:
-                                url = r.get("url") or r.get("link")
-                                if not url:
-                                    continue
-                                content = fetch_page(url)
-                                if content:
-                                    extracted.append(content[:800])
-                            except Exception as e:
-                                logger.warning(f"[BROWSE] Failed to fetch: {e}")
-                                continue
-
-                        if not extracted:
-                            msg = "I found sources but couldn't extract content."
-                            yield f"data: {json.dumps({'type': 'text', 'text': msg})}\n\n"
-                        else:
-                            context = "\n---\n".join(extracted)
-                            logger.info("[GROQ] starting streaming for browsing query")
-                            stream = groq_response_streaming(f"Answer using these sources:\n{context}\n\nQuestion: {user_input}")
-                            if stream is None:
-                                yield f"data: {json.dumps({'type': 'text', 'text': '[Groq API not available]'})}\n\n"
-                            else:
-                                full_text = ""
-                                for chunk in stream:
-                                    logger.info(f"[GROQ] chunk: {chunk}")
-                                    full_text += chunk
-                                    yield f"data: {json.dumps({'type': 'text', 'text': chunk})}\n\n"
-                                if full_text:
-                                    save_message(chat_id, user_id, "assistant", full_text)
+                        # An upstream error means the text so far is incomplete
+                        failed = failed or kind == 'error'
+                        yield emit(kind, text)
+
+                if chunks and not failed:
+                    queue_message(chat_id, user_id, "assistant", "".join(chunks))
+
+                if send_timing:
+                    timings = {**timings, "total_s": round(time.perf_counter() - received, 3)}
+                    yield emit('timing', timings=timings)
                 
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield emit('done')
+                outcome = "error" if failed else "completed"
             
+            except (ClientDisconnected, asyncio.CancelledError, GeneratorExit) as e:
+                # Client left: upstream work is unwound and nothing is persisted
+                outcome = "aborted"
+                logger.info("[ASK] Client disconnected - stream aborted")
+                if not isinstance(e, ClientDisconnected):
+                    raise
             except Exception as e:
                 logger.error(f"[ERROR] Streaming error: {e}", exc_info=True)
-                yield f"data: {json.dumps({'type': 'error', 'text': str(e)})}\n\n"
-
-        return StreamingResponse(generate(), media_type="text/event-stream")
+                yield emit('error', str(e))
+            finally:
+                ticket.release()
+                ASK_REQUESTS.inc(path=path)
+                ASK_STREAM_SECONDS.observe(time.perf_counter() - received, path=path)
+                logger.info(f"[SSE] stream stats: {stats.publish(outcome)}")
+
+        stream = generate()
+        # Covers a response that is dropped before the generator ever starts
+        weakref.finalize(stream, ticket.release)
+        handed_off = True
+        return StreamingResponse(stream, media_type="text/event-stream")
 
     except Exception:
         logger.error("[ASK] Fatal error", exc_info=True)
         def error_gen():
-            yield f"data: {json.dumps({'type': 'error', 'text': 'Internal server error'})}\n\n"
+            yield sse_event('error', 'Internal server error')
         return StreamingResponse(error_gen(), media_type="text/event-stream", status_code=500)
+    finally:
+        # Failed (or was cancelled) after admission but before the stream took the slot
+        if ticket is not None and not handed_off:
+            ticket.release()
+
+@app.on_event("startup")
+async def warm_groq_connections():
+    """Pre-open pooled Groq connections in the background"""
+    async def warm():
+        warmed = await groq_client.warm_up_async()
+        logger.info(f"[GROQ] Warmed {warmed} pooled connection(s)")
+    app.state.groq_warmup = asyncio.create_task(warm())
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Close pooled HTTP connections on shutdown"""
+    await groq_client.aclose_async_client()
+    await web_search.aclose_async_client()
+    groq_client.close_http_client()
+
+
+@app.on_event("shutdown")
+async def flush_persistence_queue():
+    """Write out any messages still waiting in the persistence queue"""
+    await asyncio.to_thread(persistence_queue.stop)
+
 
 @app.get("/chats")
 async def chats_list(req: Request):
@@ -417,6 +633,41 @@ async def set_mode(req: Request):
         return JSONResponse({"mode": "online"})
 
 
+@app.get("/status/streams")
+async def stream_status():
+    """Stream outcome counters and in-flight merge stats"""
+    return JSONResponse({
+        "completed": SSE_STREAMS.value(outcome="completed"),
+        "aborted": SSE_STREAMS.value(outcome="aborted"),
+        "inflight_browsing": len(inflight),
+        "merged_requests": inflight.merged,
+        "answer_cache": answer_cache.stats(),
+        "search_cache": web_search.search_cache.stats(),
+        "page_cache": web_search.page_cache.stats(),
+        "search_governor": web_search.search_governor.status(),
+        "page_fetches": fetch_client.status(),
+        "conversation_memory": memory.status()
+    })
+
+
+@app.get("/status/admission")
+async def admission_status():
+    """Current /ask concurrency, queue depth and rejection counters"""
+    return JSONResponse(admission.status())
+
+
+@app.get("/status/models")
+async def model_status():
+    """Live per-model latency stats and routing demotions"""
+    return JSONResponse(router.status())
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of all process metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/status/connectivity")
 async def connectivity_status():
     """Get connectivity status"""
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark fetch_page text extraction engines on saved HTML pages.
+
+Measures CPU time per page for every installed engine in
+text_extractor (bs4 is the original full-tree path) at the real
+MAX_PAGE_CHARS cap, and checks each engine's output against bs4's
+when bs4 is installed. The bundled pages are synthetic stand-ins
+shaped like docs/news/reference pages; save real ones with --record.
+
+    python benchmarks/extract_bench.py
+    python benchmarks/extract_bench.py --record https://docs.python.org/3/library/asyncio-task.html
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from text_extractor import EXTRACTORS, DEFAULT_EXTRACTOR
+
+PAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+MAX_PAGE_CHARS = 3000  # web_search.MAX_PAGE_CHARS, without importing its HTTP stack
+
+
+def installed_engines():
+    engines = {}
+    for name, extract in EXTRACTORS.items():
+        try:
+            extract("<p>probe</p>", 10)
+        except ImportError:
+            continue
+        engines[name] = extract
+    return engines
+
+
+def cpu_per_page(extract, html: str, limit: int, repeat: int):
+    text = extract(html, limit)
+    start = time.process_time()
+    for _ in range(repeat):
+        extract(html, limit)
+    return text, (time.process_time() - start) / repeat
+
+
+def run(repeat: int, limit: int):
+    paths = sorted(glob.glob(os.path.join(PAGE_DIR, "*.html")))
+    if not paths:
+        print(f"No pages in {PAGE_DIR}; record one with --record")
+        return
+
+    engines = installed_engines()
+    names = sorted(engines, key=lambda n: n != "bs4")
+    print(f"Engines: {', '.join(names)} (default: {DEFAULT_EXTRACTOR})   cap: {limit} chars   repeat: {repeat}")
+    print(f"{'page':<28}{'KB':>6}" + "".join(f"{name + ' ms':>12}" for name in names))
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+
+        row, texts = [], {}
+        for name in names:
+            texts[name], seconds = cpu_per_page(engines[name], html, limit, repeat)
+            row.append(f"{seconds * 1e3:>12.2f}")
+        print(f"{os.path.basename(path):<28}{len(html) // 1024:>6}" + "".join(row))
+
+        for name, text in texts.items():
+            if "bs4" in texts and text != texts["bs4"]:
+                print(f"  {name}: output differs from bs4 ({len(text)} vs {len(texts['bs4'])} chars)")
+
+
+def record(url: str):
+    """Save a live page into the corpus"""
+    import requests
+    from urllib.parse import urlparse
+
+    response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+    response.raise_for_status()
+    parsed = urlparse(url)
+    name = (parsed.netloc + parsed.path).strip("/").replace("/", "_") or "page"
+    os.makedirs(PAGE_DIR, exist_ok=True)
+    path = os.path.join(PAGE_DIR, f"{name[:80]}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(response.text)
+    print(f"Recorded {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=MAX_PAGE_CHARS)
+    parser.add_argument("--record", metavar="URL")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+    else:
+        run(args.repeat, args.limit)
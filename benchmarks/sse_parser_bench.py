@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Groq SSE parsing path on recorded stream captures.
+
+Compares CPU time per token of the old path (text line iteration,
+startswith/slicing and json.loads on every line) with sse_parser
+(byte-level incremental decoding plus the fastest JSON decoder).
+Captures are replayed in randomly sized chunks so frames are split
+across reads the way they are on a real socket.
+
+    python benchmarks/sse_parser_bench.py
+    python benchmarks/sse_parser_bench.py --record "Explain TCP slow start"
+"""
+
+import os
+import sys
+import json
+import glob
+import codecs
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sse_parser import JSON_DECODER, iter_content
+
+CAPTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "captures")
+
+
+def legacy_tokens(chunks):
+    """The pre-sse_parser path: httpx-style text line decoding + json.loads per line"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = text.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line or not line.startswith("data: "):
+                continue
+            data_str = line[6:]
+            if data_str == "[DONE]":
+                return
+            try:
+                data = json.loads(data_str)
+                delta = data["choices"][0].get("delta", {})
+                token = delta.get("content")
+                if token:
+                    yield token
+            except Exception:
+                continue
+
+
+def split_chunks(raw: bytes, seed: int, max_size: int):
+    rng = random.Random(seed)
+    chunks, i = [], 0
+    while i < len(raw):
+        size = rng.randint(1, max_size)
+        chunks.append(raw[i:i + size])
+        i += size
+    return chunks
+
+
+def cpu_per_token(parse, chunks, repeat: int):
+    tokens = list(parse(chunks))
+    start = time.process_time()
+    for _ in range(repeat):
+        for _ in parse(chunks):
+            pass
+    elapsed = time.process_time() - start
+    return tokens, elapsed / (repeat * max(len(tokens), 1))
+
+
+def run(repeat: int, max_chunk: int):
+    paths = sorted(glob.glob(os.path.join(CAPTURE_DIR, "*.sse")))
+    if not paths:
+        print(f"No captures in {CAPTURE_DIR}; record one with --record")
+        return
+
+    print(f"JSON decoder: {JSON_DECODER}   chunks: 1-{max_chunk} bytes   repeat: {repeat}")
+    print(f"{'capture':<32}{'tokens':>8}{'before us/tok':>15}{'after us/tok':>14}{'speedup':>9}")
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        chunks = split_chunks(raw, seed=len(raw), max_size=max_chunk)
+
+        before_tokens, before = cpu_per_token(legacy_tokens, chunks, repeat)
+        after_tokens, after = cpu_per_token(iter_content, chunks, repeat)
+        if before_tokens != after_tokens:
+            print(f"{os.path.basename(path)}: token mismatch ({len(before_tokens)} vs {len(after_tokens)})")
+            continue
+
+        print(
+            f"{os.path.basename(path):<32}{len(after_tokens):>8}"
+            f"{before * 1e6:>15.2f}{after * 1e6:>14.2f}{before / after:>8.1f}x"
+        )
+
+
+def record(prompt: str, model: str):
+    """Save a raw streaming response from Groq as a new capture"""
+    from groq_client import GROQ_API_KEY, GROQ_API_URL, get_http_client
+
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": True,
+    }
+    os.makedirs(CAPTURE_DIR, exist_ok=True)
+    path = os.path.join(CAPTURE_DIR, f"{model}-{int(time.time())}.sse")
+    with get_http_client().stream(
+        "POST",
+        f"{GROQ_API_URL}/chat/completions",
+        json=payload,
+        headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
+    ) as r, open(path, "wb") as f:
+        r.raise_for_status()
+        for chunk in r.iter_bytes():
+            f.write(chunk)
+    print(f"Recorded {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--max-chunk", type=int, default=1400)
+    parser.add_argument("--record", metavar="PROMPT")
+    parser.add_argument("--model", default="llama-3.1-8b-instant")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.model)
+    else:
+        run(args.repeat, args.max_chunk)
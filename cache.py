@@ -0,0 +1,346 @@
+"""
+Caching
+Thread-safe in-process TTL + LRU cache, a SQLite-backed TTL + LRU cache
+shared across processes, an HTTP-aware page cache with revalidation,
+and query normalization
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# =========================
+# QUERY NORMALIZATION
+# =========================
+
+def normalize_query(text: str) -> str:
+    """Collapse case, whitespace and trailing punctuation so repeats share a key"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+# =========================
+# TTL + LRU CACHE
+# =========================
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after `ttl` seconds.
+    Safe to share between the event loop and worker threads.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# =========================
+# PERSISTENT TTL + LRU CACHE
+# =========================
+
+class SQLiteCache:
+    """
+    Disk-backed TTL + LRU cache for JSON-serializable values.
+
+    Every process (and thread) opening the same file shares the entries,
+    and they survive restarts. Expiry uses wall-clock time so it means
+    the same thing in every process. The file uses WAL mode so readers
+    never block on a writer. Any SQLite error is treated as a miss, so
+    the cache can never break its caller.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 3600,
+                 table: str = "cache"):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            self.errors += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            # Drop expired rows, then the least recently used beyond the cap
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        except (sqlite3.Error, TypeError, ValueError):
+            self.errors += 1
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error:
+            self.errors += 1
+
+    def __len__(self) -> int:
+        try:
+            return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+# =========================
+# HTTP PAGE CACHE
+# =========================
+
+_CACHE_DIRECTIVE = re.compile(r"([a-z-]+)\s*(?:=\s*\"?(\d+)\"?)?")
+
+
+def freshness_lifetime(headers) -> Optional[float]:
+    """
+    Seconds a response may be reused without revalidation, from
+    Cache-Control max-age minus Age. 0 means "revalidate every time"
+    (no-cache or no max-age); None means the response must not be stored.
+    """
+    directives = dict(_CACHE_DIRECTIVE.findall((headers.get("cache-control") or "").lower()))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives or not directives.get("max-age"):
+        return 0.0
+    try:
+        age = float(headers.get("age") or 0)
+    except ValueError:
+        age = 0.0
+    return max(float(directives["max-age"]) - age, 0.0)
+
+
+class CachedPage:
+    """Extracted text of a page plus the validators needed to revalidate it"""
+
+    __slots__ = ("text", "etag", "last_modified", "fresh_until", "size")
+
+    def __init__(self, text: str, etag: Optional[str], last_modified: Optional[str], fresh_until: float):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+        self.size = len(text.encode("utf-8")) + len(etag or "") + len(last_modified or "")
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.fresh_until
+
+    def validators(self) -> Dict[str, str]:
+        """Request headers for a conditional GET"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    LRU cache of extracted page text keyed by URL, bounded by total bytes.
+
+    Fresh entries (within Cache-Control max-age, capped at `max_ttl`) are
+    served without touching the network. Stale entries keep their ETag /
+    Last-Modified so the caller can revalidate with a conditional GET and
+    call `refresh` on a 304. Responses with neither a lifetime nor a
+    validator are not stored, since they could never be reused.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, max_ttl: float = 86400):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self._data: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Entry for `url`, fresh or stale; check `.fresh` before skipping the request"""
+        with self._lock:
+            page = self._data.get(url)
+            if page is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(url)
+            if page.fresh:
+                self.hits += 1
+            return page
+
+    def put(self, url: str, text: str, headers) -> Optional[CachedPage]:
+        lifetime = freshness_lifetime(headers)
+        etag, last_modified = headers.get("etag"), headers.get("last-modified")
+        if lifetime is None or not text or not (lifetime or etag or last_modified):
+            self.discard(url)
+            return None
+
+        page = CachedPage(text, etag, last_modified, time.monotonic() + min(lifetime, self.max_ttl))
+        if page.size > self.max_bytes:
+            self.discard(url)
+            return None
+        with self._lock:
+            old = self._data.pop(url, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._data[url] = page
+            self._bytes += page.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+        return page
+
+    def refresh(self, url: str, headers) -> Optional[CachedPage]:
+        """Record a 304: the stored text is still current, restart its lifetime"""
+        lifetime = freshness_lifetime(headers)
+        with self._lock:
+            page = self._data.get(url)
+            if page is None:
+                return None
+            if lifetime is None:
+                self._data.pop(url)
+                self._bytes -= page.size
+                return page
+            page.fresh_until = time.monotonic() + min(lifetime, self.max_ttl)
+            # A 304 may carry an updated validator
+            page.etag = headers.get("etag") or page.etag
+            page.last_modified = headers.get("last-modified") or page.last_modified
+            self.revalidated += 1
+            return page
+
+    def discard(self, url: str) -> None:
+        with self._lock:
+            page = self._data.pop(url, None)
+            if page is not None:
+                self._bytes -= page.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,160 @@
+"""
+Conversation Memory
+Bounded multi-turn context per chat: a rolling summary stored on the
+Chat row plus the last few messages verbatim. The summary is extended
+incrementally in the background as messages are written, so building
+context for a prompt is one small query however long the chat is.
+"""
+
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from database import (
+    get_chat_context,
+    get_unsummarized_messages,
+    save_chat_summary,
+    persistence_queue,
+)
+
+# =========================
+# CONFIGURATION
+# =========================
+
+CONTEXT_ENABLED = os.getenv("CONTEXT_ENABLED", "true").lower() in ("true", "1", "yes")
+# Verbatim user+assistant turns kept after the summary
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "3"))
+# Summarize once this many messages beyond the recent window have piled up
+CONTEXT_SUMMARIZE_AFTER = int(os.getenv("CONTEXT_SUMMARIZE_AFTER", "4"))
+# Messages folded per summarization call (long backlogs take several calls)
+CONTEXT_FOLD_BATCH = int(os.getenv("CONTEXT_FOLD_BATCH", "12"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "256"))
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an assistant.
+Keep facts, names, numbers, decisions and open questions the user may refer back to.
+Write at most {words} words of plain prose.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+CONTEXT_SUMMARIES = metrics.counter(
+    "context_summaries_total", "Rolling chat summary updates by outcome", ("outcome",)
+)
+CONTEXT_SUMMARY_SECONDS = metrics.histogram(
+    "context_summary_seconds", "Time to fold older messages into a chat summary"
+)
+
+
+class ChatContext:
+    """What a prompt needs to know about the conversation so far"""
+
+    def __init__(self, summary: Optional[str] = None, turns: Optional[List[Tuple[str, str]]] = None):
+        self.summary = summary
+        self.turns = turns or []
+
+    def __bool__(self) -> bool:
+        return bool(self.summary or self.turns)
+
+    @property
+    def digest(self) -> str:
+        """Short fingerprint, so cached answers are only reused for identical context"""
+        h = hashlib.sha1((self.summary or "").encode("utf-8"))
+        for role, content in self.turns:
+            h.update(f"\0{role}\0{content}".encode("utf-8"))
+        return h.hexdigest()[:16]
+
+
+class ConversationMemory:
+    """
+    Loads ChatContext for prompts and keeps chat summaries up to date.
+
+    Summaries are updated on a single background thread after the
+    write-behind queue commits a batch, so each chat is folded in order
+    and no request ever waits on a summarization call.
+    """
+
+    def __init__(self, recent_turns: int = CONTEXT_RECENT_TURNS,
+                 summarize_after: int = CONTEXT_SUMMARIZE_AFTER):
+        self.recent_messages = recent_turns * 2
+        self.summarize_after = summarize_after
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+        self._scheduled = set()
+        self._lock = threading.Lock()
+
+    def load(self, chat_id, user_id) -> ChatContext:
+        """Summary + last K turns for a chat (blocking; call via a thread from async code)"""
+        if not CONTEXT_ENABLED:
+            return ChatContext()
+        context = get_chat_context(chat_id, user_id, recent=self.recent_messages)
+        return ChatContext(context["summary"], [tuple(turn) for turn in context["recent"]])
+
+    def on_messages_saved(self, chat_pks) -> None:
+        """PersistenceQueue listener: schedule a summary check for each touched chat"""
+        if not CONTEXT_ENABLED:
+            return
+        for chat_pk in chat_pks:
+            with self._lock:
+                if chat_pk in self._scheduled:
+                    continue
+                self._scheduled.add(chat_pk)
+            self._executor.submit(self._update, chat_pk)
+
+    def _update(self, chat_pk: int) -> None:
+        with self._lock:
+            self._scheduled.discard(chat_pk)
+
+        summary, messages = get_unsummarized_messages(chat_pk)
+        overflow = len(messages) - self.recent_messages
+        if overflow < self.summarize_after:
+            return
+
+        # Fold everything older than the recent window, a batch at a time
+        for start in range(0, overflow, CONTEXT_FOLD_BATCH):
+            folding = messages[start:min(start + CONTEXT_FOLD_BATCH, overflow)]
+            with CONTEXT_SUMMARY_SECONDS.time():
+                updated = summarize(summary, [(role, content) for _, role, content in folding])
+            if updated is None:
+                CONTEXT_SUMMARIES.inc(outcome="error")
+                return
+            summary = updated
+            save_chat_summary(chat_pk, summary, folding[-1][0])
+            CONTEXT_SUMMARIES.inc(outcome="ok")
+
+    def status(self) -> Dict:
+        return {
+            "enabled": CONTEXT_ENABLED,
+            "recent_turns": self.recent_messages // 2,
+            "summarize_after": self.summarize_after,
+            "pending": len(self._scheduled),
+        }
+
+
+def summarize(summary: Optional[str], messages: List[Tuple[str, str]]) -> Optional[str]:
+    """Extend `summary` with `messages` in one Groq call; None if Groq is unavailable"""
+    from groq_client import groq_response
+    from prompt_builder import truncate_to_tokens
+
+    lines = "\n".join(
+        f"{'User' if role == 'user' else 'Assistant'}: {truncate_to_tokens(content, 200)}"
+        for role, content in messages
+    )
+    prompt = SUMMARY_PROMPT.format(
+        words=int(CONTEXT_SUMMARY_TOKENS * 0.7),
+        summary=summary or "(none yet)",
+        messages=lines,
+    )
+    result = groq_response(prompt, model=CONTEXT_SUMMARY_MODEL, max_tokens=CONTEXT_SUMMARY_TOKENS)
+    return result or None
+
+
+memory = ConversationMemory()
+persistence_queue.add_listener(memory.on_messages_saved)
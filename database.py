@@ -4,9 +4,18 @@ Handles all SQLAlchemy setup and database operations
 SAFE for guest/debug users
 """
 
-from sqlalchemy import create_engine
+import os
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+import metrics
+
 # =========================
 # DATABASE CONFIGURATION
 # =========================
@@ -26,6 +35,10 @@ SessionLocal = sessionmaker(
 
 Base = declarative_base()
 
+SAVE_MESSAGE_SECONDS = metrics.histogram("save_message_seconds", "Synchronous save_message latency")
+PERSIST_BATCH_SECONDS = metrics.histogram("persist_batch_seconds", "Write-behind batch transaction latency")
+PERSIST_BATCH_MESSAGES = metrics.histogram("persist_batch_size", "Messages per write-behind transaction")
+
 # =========================
 # USER ID NORMALIZATION
 # =========================
@@ -52,6 +65,25 @@ def init_db():
     """Create all tables"""
     from models import User, Chat, Message
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+def _add_missing_columns():
+    """
+    Lightweight migration: create_all() never alters existing tables,
+    so add any model column an older database is missing
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}"))
+            print(f"[DB] Added column {table.name}.{column.name}")
 
 def get_db():
     """FastAPI dependency"""
@@ -67,6 +99,11 @@ def get_db():
 
 def save_message(chat_id, user_id, role, content):
     """Save a message safely (supports guest users)"""
+    with SAVE_MESSAGE_SECONDS.time():
+        return _save_message(chat_id, user_id, role, content)
+
+
+def _save_message(chat_id, user_id, role, content):
     db = SessionLocal()
     try:
         from models import Chat, Message
@@ -181,6 +218,90 @@ def get_chat_history(chat_id, user_id):
     finally:
         db.close()
 
+def get_chat_context(chat_id, user_id, recent=6):
+    """
+    Stored summary plus the last `recent` messages not yet folded into it.
+    Returns {"chat": pk or None, "summary": str or None, "recent": [[role, content], ...]}
+    """
+    db = SessionLocal()
+    try:
+        from models import Chat, Message
+
+        chat = db.query(Chat).filter(
+            Chat.title == str(chat_id),
+            Chat.user_id == normalize_user_id(user_id)
+        ).first()
+
+        if not chat:
+            return {"chat": None, "summary": None, "recent": []}
+
+        messages = (
+            db.query(Message)
+            .filter(Message.chat_id == chat.id, Message.id > (chat.summary_upto or 0))
+            .order_by(Message.id.desc())
+            .limit(recent)
+            .all()
+        )
+
+        return {
+            "chat": chat.id,
+            "summary": chat.summary,
+            "recent": [[msg.role, msg.content] for msg in reversed(messages)],
+        }
+
+    except Exception as e:
+        print(f"[DB] get_chat_context error: {e}")
+        return {"chat": None, "summary": None, "recent": []}
+    finally:
+        db.close()
+
+def get_unsummarized_messages(chat_pk):
+    """(summary, [(message_id, role, content), ...]) for messages after the summary"""
+    db = SessionLocal()
+    try:
+        from models import Chat, Message
+
+        chat = db.query(Chat).filter(Chat.id == chat_pk).first()
+        if not chat:
+            return None, []
+
+        messages = (
+            db.query(Message)
+            .filter(Message.chat_id == chat.id, Message.id > (chat.summary_upto or 0))
+            .order_by(Message.id.asc())
+            .all()
+        )
+        return chat.summary, [(msg.id, msg.role, msg.content) for msg in messages]
+
+    except Exception as e:
+        print(f"[DB] get_unsummarized_messages error: {e}")
+        return None, []
+    finally:
+        db.close()
+
+def save_chat_summary(chat_pk, summary, upto_message_id):
+    """Store a chat's rolling summary and the last message it covers"""
+    db = SessionLocal()
+    try:
+        from models import Chat
+
+        chat = db.query(Chat).filter(Chat.id == chat_pk).first()
+        if not chat:
+            return False
+
+        chat.summary = summary
+        chat.summary_upto = upto_message_id
+        chat.summary_updated_at = datetime.utcnow()
+        db.commit()
+        return True
+
+    except Exception as e:
+        db.rollback()
+        print(f"[DB] save_chat_summary error: {e}")
+        return False
+    finally:
+        db.close()
+
 def delete_chat(chat_id, user_id):
     """Delete a chat safely"""
     db = SessionLocal()
@@ -210,3 +331,153 @@ def delete_chat(chat_id, user_id):
         return False
     finally:
         db.close()
+
+# =========================
+# WRITE-BEHIND PERSISTENCE
+# =========================
+
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "64"))
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "0.2"))
+
+_STOP = object()
+
+
+class PersistenceQueue:
+    """
+    Background writer for chat messages.
+
+    enqueue() returns immediately; a daemon thread groups whatever
+    arrives within PERSIST_FLUSH_INTERVAL (up to PERSIST_BATCH_SIZE
+    messages) into a single transaction.
+    """
+
+    def __init__(self, batch_size=PERSIST_BATCH_SIZE, flush_interval=PERSIST_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """Call fn(chat_pks) on the writer thread after each batch is written"""
+        self._listeners.append(fn)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="persistence-queue", daemon=True
+                )
+                self._thread.start()
+
+    def enqueue(self, chat_id, user_id, role, content):
+        """Queue a message for saving; never blocks on the database"""
+        self.start()
+        self._queue.put((chat_id, user_id, role, content, datetime.utcnow()))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until everything queued so far has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self, timeout=10):
+        """Flush outstanding messages and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Never let one bad batch kill the writer thread
+                print(f"[DB] persistence writer error ({len(batch)} messages): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        PERSIST_BATCH_MESSAGES.observe(len(batch))
+        with PERSIST_BATCH_SECONDS.time():
+            chat_pks = self._commit_batch(batch)
+        for fn in self._listeners:
+            try:
+                fn(chat_pks)
+            except Exception as e:
+                print(f"[DB] persistence listener error: {e}")
+
+    def _commit_batch(self, batch):
+        db = SessionLocal()
+        try:
+            from models import Chat, Message
+
+            chats = {}
+            for chat_id, user_id, role, content, created_at in batch:
+                key = (str(chat_id), normalize_user_id(user_id))
+                chat = chats.get(key)
+                if chat is None:
+                    chat = db.query(Chat).filter(
+                        Chat.title == key[0],
+                        Chat.user_id == key[1]
+                    ).first()
+                    if not chat:
+                        chat = Chat(title=key[0], user_id=key[1])
+                        db.add(chat)
+                        db.flush()
+                    chats[key] = chat
+
+                db.add(Message(
+                    chat_id=chat.id,
+                    role=role,
+                    content=content,
+                    created_at=created_at
+                ))
+            db.commit()
+            return {chat.id for chat in chats.values()}
+
+        except Exception as e:
+            db.rollback()
+            print(f"[DB] persistence batch error ({len(batch)} messages), retrying one by one: {e}")
+            for chat_id, user_id, role, content, _ in batch:
+                save_message(chat_id, user_id, role, content)
+            return set()
+        finally:
+            db.close()
+
+
+persistence_queue = PersistenceQueue()
+atexit.register(persistence_queue.stop)
+metrics.gauge("persist_queue_depth", "Messages waiting to be written", fn=persistence_queue.pending)
+
+
+def queue_message(chat_id, user_id, role, content):
+    """Write-behind variant of save_message for latency-sensitive callers"""
+    persistence_queue.enqueue(chat_id, user_id, role, content)
@@ -0,0 +1,398 @@
+"""
+Fetch Client
+Shared plumbing for page fetches: a keep-alive requests session with
+one connection pool per host, a DNS cache used only by page-fetch
+connections (sync and async), and host-aware schedulers that cap
+concurrent requests per host and hand out free slots round-robin
+across hosts, so one slow domain cannot starve the rest.
+"""
+
+import os
+import socket
+import asyncio
+import ipaddress
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import httpcore
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+from cache import TTLCache
+
+# =========================
+# CONFIGURATION
+# =========================
+
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))  # threads behind fetch_pages
+FETCH_ASYNC_CONCURRENCY = int(os.getenv("FETCH_ASYNC_CONCURRENCY", "32"))  # in-flight async fetches
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))  # concurrent requests to any one host
+FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "32"))  # hosts whose connections are kept alive
+
+DNS_CACHE_ENABLED = os.getenv("DNS_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+# getaddrinfo does not report record TTLs, so keep this short; failed connects also evict
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "60"))
+DNS_CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "1024"))
+
+
+def host_of(url: str) -> str:
+    try:
+        return urlsplit(url).netloc.lower()
+    except ValueError:
+        return ""
+
+# =========================
+# DNS CACHE
+# =========================
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+def _addresses(infos) -> List[str]:
+    """Distinct addresses from getaddrinfo results, in resolver order"""
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+class DNSCache:
+    """
+    Resolved addresses per (host, port), used only by the page-fetch
+    connections below; nothing else in the process is affected.
+    Lookup failures are not cached, and an entry is dropped as soon as
+    none of its addresses accept a connection, so a moved host is
+    re-resolved on the next attempt rather than after the TTL.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL, max_entries: int = DNS_CACHE_SIZE):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """Addresses to try for host:port (the host itself if it is a literal or unresolvable)"""
+        if _is_ip(host):
+            return [host]
+        cached = self._cache.get((host, port))
+        if cached is not None:
+            return list(cached)
+        try:
+            addresses = _addresses(socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        except OSError:
+            # Let the connection attempt surface the resolver error as usual
+            return [host]
+        return self._store(host, port, addresses)
+
+    async def resolve_async(self, host: str, port: int) -> List[str]:
+        if _is_ip(host):
+            return [host]
+        cached = self._cache.get((host, port))
+        if cached is not None:
+            return list(cached)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            return [host]
+        return self._store(host, port, _addresses(infos))
+
+    def _store(self, host: str, port: int, addresses: List[str]) -> List[str]:
+        if not addresses:
+            return [host]
+        self._cache.set((host, port), tuple(addresses))
+        return addresses
+
+    def forget(self, host: str, port: int) -> None:
+        self._cache.discard((host, port))
+
+    def stats(self) -> Dict:
+        return {"enabled": DNS_CACHE_ENABLED, **self._cache.stats()}
+
+
+dns_cache = DNSCache()
+
+
+class _CachedDNSConnection:
+    """
+    urllib3 connection mixin: connect to the cached addresses in turn.
+    Only the TCP target changes; the Host header, SNI and certificate
+    checks still use the real host name.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        last_error = None
+        try:
+            for address in dns_cache.resolve(host, self.port):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError as e:  # also covers NewConnectionError
+                    last_error = e
+        finally:
+            self._dns_host = host
+        dns_cache.forget(host, self.port)
+        raise last_error
+
+
+class _CachedHTTPConnection(_CachedDNSConnection, HTTPConnection):
+    pass
+
+
+class _CachedHTTPSConnection(_CachedDNSConnection, HTTPSConnection):
+    pass
+
+
+class _CachedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedHTTPConnection
+
+
+class _CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedHTTPSConnection
+
+
+class FetchAdapter(HTTPAdapter):
+    """requests adapter whose direct (non-proxy) connections use the DNS cache"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if DNS_CACHE_ENABLED:
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _CachedHTTPConnectionPool,
+                "https": _CachedHTTPSConnectionPool,
+            }
+
+
+class _CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that connects to cached addresses; TLS still uses the host name"""
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend):
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        last_error = None
+        for address in await dns_cache.resolve_async(host, port):
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout,
+                    local_address=local_address, socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        dns_cache.forget(host, port)
+        raise last_error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+def async_transport(**kwargs) -> httpx.AsyncHTTPTransport:
+    """Transport for the async page-fetch client, resolving through the DNS cache"""
+    transport = httpx.AsyncHTTPTransport(**kwargs)
+    if DNS_CACHE_ENABLED:
+        # httpx has no public hook for the network backend; wrap the pool's own
+        pool = transport._pool
+        pool._network_backend = _CachedDNSBackend(pool._network_backend)
+    return transport
+
+# =========================
+# CONNECTION POOLS
+# =========================
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Shared session; urllib3 keeps a pool of up to FETCH_PER_HOST connections per host"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = FetchAdapter(
+                    pool_connections=FETCH_POOL_HOSTS,
+                    pool_maxsize=FETCH_PER_HOST,
+                    max_retries=0,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+# =========================
+# HOST-AWARE SCHEDULING
+# =========================
+
+class _HostQueues:
+    """
+    Per-host FIFO queues served round-robin. A host's next item may
+    start when fewer than `per_host` of its items are active and fewer
+    than `total` items are active overall. Callers hold their own lock.
+    """
+
+    def __init__(self, total: int, per_host: int):
+        self.total = max(total, 1)
+        self.per_host = max(per_host, 1)
+        self._queues: Dict[str, Deque] = {}
+        self._turns: Deque[str] = deque()  # hosts with queued items, next turn first
+        self._active: Dict[str, int] = {}
+        self.running = 0
+        self.started = 0
+
+    def _push(self, host: str, item) -> None:
+        queue = self._queues.get(host)
+        if queue is None:
+            queue = self._queues[host] = deque()
+            self._turns.append(host)
+        queue.append(item)
+
+    def _pop(self) -> Optional[Tuple[str, object]]:
+        """Claim the next item allowed to start, or None"""
+        if self.running >= self.total:
+            return None
+        for _ in range(len(self._turns)):
+            host = self._turns[0]
+            self._turns.rotate(-1)
+            if self._active.get(host, 0) >= self.per_host:
+                continue
+            queue = self._queues[host]
+            item = queue.popleft()
+            if not queue:
+                del self._queues[host]
+                self._turns.remove(host)
+            self._active[host] = self._active.get(host, 0) + 1
+            self.running += 1
+            self.started += 1
+            return host, item
+        return None
+
+    def _done(self, host: str) -> None:
+        self.running -= 1
+        remaining = self._active[host] - 1
+        if remaining:
+            self._active[host] = remaining
+        else:
+            del self._active[host]
+
+    def status(self) -> Dict:
+        return {
+            "total": self.total,
+            "per_host": self.per_host,
+            "running": self.running,
+            "queued": sum(len(q) for q in self._queues.values()),
+            "hosts_active": len(self._active),
+            "hosts_waiting": len(self._turns),
+            "started": self.started,
+        }
+
+
+class HostScheduler(_HostQueues):
+    """
+    Thread-pool front end: submit() queues a call under its URL's host
+    and returns a Future. Work only reaches the pool when it may start,
+    so a busy host never ties up a worker thread. Futures cancelled
+    while queued are skipped.
+    """
+
+    def __init__(self, workers: int = FETCH_WORKERS, per_host: int = FETCH_PER_HOST):
+        super().__init__(workers, per_host)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.total, thread_name_prefix="fetch")
+
+    def submit(self, url: str, fn, *args) -> Future:
+        future = Future()
+        with self._lock:
+            self._push(host_of(url), (future, fn, args))
+        self._dispatch()
+        return future
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                claimed = self._pop()
+                if claimed is None:
+                    return
+                host, (future, fn, args) = claimed
+                if not future.set_running_or_notify_cancel():
+                    self._done(host)
+                    continue
+            self._executor.submit(self._run, host, future, fn, args)
+
+    def _run(self, host: str, future: Future, fn, args) -> None:
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                self._done(host)
+            self._dispatch()
+
+
+class AsyncHostLimiter(_HostQueues):
+    """
+    asyncio counterpart: `async with limiter.slot(url)` waits for a
+    per-host (and overall) slot, granted round-robin across hosts.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, total: int = FETCH_ASYNC_CONCURRENCY, per_host: int = FETCH_PER_HOST):
+        super().__init__(total, per_host)
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = host_of(url)
+        waiter = asyncio.get_running_loop().create_future()
+        self._push(host, waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Granted in the same tick we were cancelled: hand the slot back
+            if waiter.done() and not waiter.cancelled():
+                self._release(host)
+            raise
+        try:
+            yield
+        finally:
+            self._release(host)
+
+    def _dispatch(self) -> None:
+        while True:
+            claimed = self._pop()
+            if claimed is None:
+                return
+            host, waiter = claimed
+            if waiter.done():
+                # Cancelled while queued
+                self._done(host)
+                continue
+            waiter.set_result(None)
+
+    def _release(self, host: str) -> None:
+        self._done(host)
+        self._dispatch()
+
+
+page_scheduler = HostScheduler()
+async_page_limiter = AsyncHostLimiter()
+
+
+def status() -> Dict:
+    return {
+        "threads": page_scheduler.status(),
+        "async": async_page_limiter.status(),
+        "dns_cache": dns_cache.stats(),
+    }
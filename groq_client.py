@@ -1,59 +1,165 @@
 import os
 import json
 import time
-import requests
-from typing import Optional, Generator, Dict
+import asyncio
+import hashlib
+import threading
+import httpx
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional, Generator, AsyncGenerator, Dict, Iterable, Iterator, Union
 from dotenv import load_dotenv
 
+import metrics
+from rate_limit import GroqRateLimiter
+from prompt_builder import DEFAULT_MAX_TOKENS, count_tokens
+from resilience import CircuitBreakers, backoff_delay
+from sse_parser import aiter_content, iter_content
+
 # ---------------------------------------
 # Environment
 # ---------------------------------------
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-GROQ_API_URL = "https://api.groq.com/openai/v1"
+# Point at mock_groq_server.py (http://127.0.0.1:8090/openai/v1) for offline benchmarking
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1").rstrip("/")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
 GROQ_ENABLED = os.getenv("GROQ_ENABLED", "true").lower() in ("true", "1", "yes")
 
 # ---------------------------------------
-# Rate limiting (local safety guard)
+# Rate limiting (per-model token buckets, synced from Groq headers)
+# ---------------------------------------
+RATE_LIMIT_REQUESTS = int(os.getenv("GROQ_RATE_LIMIT_RPM", "30"))
+RATE_LIMIT_TOKENS = int(os.getenv("GROQ_RATE_LIMIT_TPM", "6000"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("GROQ_RATE_LIMIT_MAX_WAIT", "5"))
+
+_rate_limiter = GroqRateLimiter(
+    requests_per_minute=RATE_LIMIT_REQUESTS,
+    tokens_per_minute=RATE_LIMIT_TOKENS,
+    max_wait=RATE_LIMIT_MAX_WAIT,
+)
+
+# ---------------------------------------
+# Metrics
+# ---------------------------------------
+GROQ_TTFT = metrics.histogram(
+    "groq_ttft_seconds", "Time from Groq request to first streamed token", ("model",)
+)
+GROQ_TOKENS_PER_SECOND = metrics.histogram(
+    "groq_tokens_per_second", "Streamed tokens per second after the first token", ("model",)
+)
+GROQ_REQUEST_SECONDS = metrics.histogram(
+    "groq_request_seconds", "Total Groq request duration", ("model", "mode")
+)
+GROQ_REQUESTS = metrics.counter(
+    "groq_requests_total", "Groq requests by outcome", ("model", "outcome")
+)
+GROQ_HEDGES = metrics.counter(
+    "groq_hedges_total", "Backup requests sent after a slow first token", ("model",)
+)
+GROQ_HEDGE_WINS = metrics.counter(
+    "groq_hedge_wins_total", "Which stream won a hedged request", ("model", "winner")
+)
+GROQ_RETRIES = metrics.counter(
+    "groq_retries_total", "Groq attempts retried after a retryable failure", ("model",)
+)
+GROQ_FALLBACKS = metrics.counter(
+    "groq_fallbacks_total", "Requests sent to the fallback model while a breaker was open", ("model",)
+)
+GROQ_INTERRUPTIONS = metrics.counter(
+    "groq_stream_interruptions_total", "Streams that failed after tokens were already sent", ("model",)
+)
+
+
+class StreamInterrupted(Exception):
+    """A stream failed after yielding tokens: what the caller has is a truncated answer"""
+
+    def __init__(self, model: str, cause: Exception):
+        super().__init__(f"Groq stream from {model} was interrupted: {cause}")
+        self.model = model
+        self.cause = cause
+
+# ---------------------------------------
+# Hedging (optional backup request on a slow first token)
+# ---------------------------------------
+GROQ_HEDGE = os.getenv("GROQ_HEDGE", "false").lower() in ("true", "1", "yes")
+GROQ_HEDGE_MODEL = os.getenv("GROQ_HEDGE_MODEL", "")  # empty = same model
+GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+GROQ_HEDGE_DEFAULT_DELAY = float(os.getenv("GROQ_HEDGE_DEFAULT_DELAY", "2.0"))
+GROQ_HEDGE_MIN_DELAY = float(os.getenv("GROQ_HEDGE_MIN_DELAY", "0.3"))
+GROQ_HEDGE_MAX_DELAY = float(os.getenv("GROQ_HEDGE_MAX_DELAY", "5.0"))
+
+# ---------------------------------------
+# Retries and circuit breaking
 # ---------------------------------------
-RATE_LIMIT_REQUESTS = 30
-RATE_LIMIT_WINDOW = 60
-_request_times: list[float] = []
+# Extra attempts after a retryable failure (only before the first token)
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+GROQ_RETRY_BASE_DELAY = float(os.getenv("GROQ_RETRY_BASE_DELAY", "0.25"))
+GROQ_RETRY_MAX_DELAY = float(os.getenv("GROQ_RETRY_MAX_DELAY", "2.0"))
+# Consecutive failures that open a model's breaker, and how long it stays open
+GROQ_BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+GROQ_BREAKER_RESET = float(os.getenv("GROQ_BREAKER_RESET", "30"))
+GROQ_FALLBACK_MODEL = os.getenv("GROQ_FALLBACK_MODEL", "")  # empty = fail fast
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_breakers = CircuitBreakers(GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET)
+
+# ---------------------------------------
+# Batch generation
+# ---------------------------------------
+GROQ_BATCH_CONCURRENCY = int(os.getenv("GROQ_BATCH_CONCURRENCY", "4"))
+# Batch jobs wait this long on the rate limiter instead of GROQ_RATE_LIMIT_MAX_WAIT
+GROQ_BATCH_MAX_WAIT = float(os.getenv("GROQ_BATCH_MAX_WAIT", "120"))
+
+# ---------------------------------------
+# Pooled HTTP clients (keep-alive; HTTP/2 when h2 is installed)
+# ---------------------------------------
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "90"))
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "true").lower() in ("true", "1", "yes")
+GROQ_WARM_CONNECTIONS = int(os.getenv("GROQ_WARM_CONNECTIONS", "2"))
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
 
 # ---------------------------------------
 # Available models
 # ---------------------------------------
 AVAILABLE_MODELS = {
-    "llama-3.3-70b-versatile": {"speed": "very_fast", "capability": "very_high"},
-    "llama-3.1-8b-instant": {"speed": "ultra_fast", "capability": "medium"},
-    "mixtral-8x7b-32768": {"speed": "fast", "capability": "balanced"},
+    "llama-3.3-70b-versatile": {"speed": "very_fast", "capability": "very_high", "context": 131072},
+    "llama-3.1-8b-instant": {"speed": "ultra_fast", "capability": "medium", "context": 131072},
+    "mixtral-8x7b-32768": {"speed": "fast", "capability": "balanced", "context": 32768},
 }
 
 # ---------------------------------------
 # Helpers
 # ---------------------------------------
-def _check_rate_limit() -> bool:
-    now = time.time()
-    global _request_times
-    _request_times = [t for t in _request_times if now - t < RATE_LIMIT_WINDOW]
+def _prompt_tokens(prompt: str, system_prompt: Optional[str]) -> int:
+    return count_tokens(prompt) + (count_tokens(system_prompt) if system_prompt else 0)
 
-    if len(_request_times) >= RATE_LIMIT_REQUESTS:
-        return False
 
-    _request_times.append(now)
-    return True
+def _record_rate_limit(model: str, response: httpx.Response) -> None:
+    if response.status_code == 429:
+        _rate_limiter.on_rate_limited(model, response.headers)
+    else:
+        _rate_limiter.update_from_headers(model, response.headers)
 
 
 def get_rate_limit_status() -> Dict:
-    now = time.time()
-    active = [t for t in _request_times if now - t < RATE_LIMIT_WINDOW]
+    status = _rate_limiter.status()
+    blocked = any(m["blocked_for"] > 0 for m in status["models"].values())
     return {
-        "requests_in_window": len(active),
         "limit": RATE_LIMIT_REQUESTS,
-        "remaining": max(0, RATE_LIMIT_REQUESTS - len(active)),
-        "status": "OK" if len(active) < RATE_LIMIT_REQUESTS else "LIMITED",
+        "status": "LIMITED" if blocked else "OK",
+        **status,
     }
 
 
@@ -61,6 +167,139 @@ def validate_model(model: str) -> bool:
     return model in AVAILABLE_MODELS
 
 
+def _record_stream(model: str, start: float, first: Optional[float], tokens: int, outcome: str) -> None:
+    end = time.perf_counter()
+    GROQ_REQUESTS.inc(model=model, outcome=outcome)
+    GROQ_REQUEST_SECONDS.observe(end - start, model=model, mode="stream")
+    if first is not None and tokens > 1 and end > first:
+        GROQ_TOKENS_PER_SECOND.observe((tokens - 1) / (end - first), model=model)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, httpx.TransportError)
+
+
+def _pick_model(model: str) -> Optional[str]:
+    """`model` if its breaker lets a call through, else the fallback model, else None"""
+    if _breakers.get(model).allow():
+        return model
+    if validate_model(GROQ_FALLBACK_MODEL) and GROQ_FALLBACK_MODEL != model:
+        if _breakers.get(GROQ_FALLBACK_MODEL).allow():
+            GROQ_FALLBACKS.inc(model=model)
+            return GROQ_FALLBACK_MODEL
+    return None
+
+
+def _should_retry(model: str, exc: Exception, attempt: int, started: bool) -> bool:
+    """Report a failed attempt to the model's breaker and decide whether to try again"""
+    breaker = _breakers.get(model)
+    # 5xx and connection failures count against Groq; any other answer shows it is up
+    if isinstance(exc, httpx.TransportError) or (
+        isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code >= 500
+    ):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    if started or attempt >= GROQ_MAX_RETRIES or not _is_retryable(exc):
+        return False
+    GROQ_RETRIES.inc(model=model)
+    return True
+
+
+def _interrupted(model: str, exc: Exception) -> StreamInterrupted:
+    """Failure after the first token (already reported to the breaker): never retried"""
+    GROQ_INTERRUPTIONS.inc(model=model)
+    return StreamInterrupted(model, exc)
+
+
+def _retry_delay(attempt: int) -> float:
+    return backoff_delay(attempt - 1, GROQ_RETRY_BASE_DELAY, GROQ_RETRY_MAX_DELAY)
+
+
+def is_available(model: str) -> bool:
+    """False while the model's breaker is open (no probe due yet)"""
+    return _breakers.get(model).state != "open"
+
+
+def _client_options() -> Dict:
+    return {
+        "http2": GROQ_HTTP2 and HTTP2_AVAILABLE,
+        "timeout": httpx.Timeout(12, connect=5),
+        "limits": httpx.Limits(
+            max_connections=GROQ_POOL_SIZE,
+            max_keepalive_connections=GROQ_POOL_SIZE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Shared, thread-safe keep-alive client for the sync API"""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _client_lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def close_http_client() -> None:
+    global _sync_client
+    with _client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+async def aclose_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def warm_up() -> bool:
+    """Open a pooled connection for the sync client ahead of the first prompt"""
+    if not GROQ_API_KEY or not GROQ_ENABLED:
+        return False
+    try:
+        r = get_http_client().get(
+            f"{GROQ_API_URL}/models",
+            headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
+        )
+        return r.status_code < 500
+    except Exception:
+        return False
+
+
+async def warm_up_async(connections: int = GROQ_WARM_CONNECTIONS) -> int:
+    """
+    Pre-open `connections` pooled connections (DNS + TCP + TLS) so the
+    first user requests don't pay connection setup in their TTFT.
+    Returns how many warm-up requests succeeded.
+    """
+    if not GROQ_API_KEY or not GROQ_ENABLED or connections <= 0:
+        return 0
+
+    client = _get_async_client()
+    headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
+    results = await asyncio.gather(
+        *(client.get(f"{GROQ_API_URL}/models", headers=headers) for _ in range(connections)),
+        return_exceptions=True,
+    )
+    return sum(1 for r in results if isinstance(r, httpx.Response) and r.status_code < 500)
+
+
 # ---------------------------------------
 # Non-streaming response
 # ---------------------------------------
@@ -68,17 +307,53 @@ def groq_response(
     prompt: str,
     system_prompt: Optional[str] = None,
     model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    max_wait: Optional[float] = None,
 ) -> Optional[str]:
+    """
+    Blocking completion. `max_wait` overrides how long to wait on the
+    local rate limiter (batch jobs can afford to wait far longer).
+    """
     if not GROQ_API_KEY or not GROQ_ENABLED:
         return None
 
-    if not _check_rate_limit():
-        return None
-
     selected_model = model or GROQ_MODEL
     if not validate_model(selected_model):
         return None
 
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(_retry_delay(attempt))
+
+        current = _pick_model(selected_model)
+        if current is None:
+            GROQ_REQUESTS.inc(model=selected_model, outcome="circuit_open")
+            return None
+
+        if not _rate_limiter.acquire(current, _prompt_tokens(prompt, system_prompt), max_wait=max_wait):
+            GROQ_REQUESTS.inc(model=current, outcome="rate_limited")
+            return None
+
+        try:
+            text = _complete_once(prompt, system_prompt, current, max_tokens)
+        except Exception as e:
+            if _should_retry(current, e, attempt, started=False):
+                continue
+            return None
+
+        _breakers.get(current).record_success()
+        return text
+
+    return None
+
+
+def _complete_once(
+    prompt: str,
+    system_prompt: Optional[str],
+    selected_model: str,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """One non-streaming attempt; raises on any failure"""
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
@@ -88,7 +363,7 @@ def groq_response(
         "model": selected_model,
         "messages": messages,
         "temperature": 0.7,
-        "max_tokens": 2048,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
     }
 
     headers = {
@@ -96,16 +371,18 @@ def groq_response(
         "Content-Type": "application/json",
     }
 
+    start = time.perf_counter()
     try:
-        r = requests.post(
+        r = get_http_client().post(
             f"{GROQ_API_URL}/chat/completions",
             json=payload,
             headers=headers,
-            timeout=12,
         )
+        _record_rate_limit(selected_model, r)
         r.raise_for_status()
         data = r.json()
 
+        GROQ_REQUESTS.inc(model=selected_model, outcome="ok")
         return (
             data.get("choices", [{}])[0]
             .get("message", {})
@@ -114,7 +391,10 @@ def groq_response(
         )
 
     except Exception:
-        return None
+        GROQ_REQUESTS.inc(model=selected_model, outcome="error")
+        raise
+    finally:
+        GROQ_REQUEST_SECONDS.observe(time.perf_counter() - start, model=selected_model, mode="complete")
 
 
 # ---------------------------------------
@@ -124,69 +404,460 @@ def groq_response_streaming(
     prompt: str,
     system_prompt: Optional[str] = None,
     model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
 ) -> Generator[str, None, None]:
     """
     Ultra-fast streaming generator.
     Yields tokens immediately as they arrive.
+    Retryable failures are retried with backoff until the first token
+    has been yielded; after that a failure raises StreamInterrupted so
+    callers never mistake a truncated answer for a finished one.
     """
     if not GROQ_API_KEY or not GROQ_ENABLED:
         return
 
-    if not _check_rate_limit():
-        return
-
     selected_model = model or GROQ_MODEL
     if not validate_model(selected_model):
         return
 
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(_retry_delay(attempt))
+
+        current = _pick_model(selected_model)
+        if current is None:
+            GROQ_REQUESTS.inc(model=selected_model, outcome="circuit_open")
+            return
+
+        if not _rate_limiter.acquire(current, _prompt_tokens(prompt, system_prompt)):
+            GROQ_REQUESTS.inc(model=current, outcome="rate_limited")
+            return
+
+        started = False
+        stream = _stream_once(prompt, system_prompt, current, max_tokens)
+        try:
+            for token in stream:
+                if not started:
+                    started = True
+                    _breakers.get(current).record_success()
+                yield token
+        except Exception as e:
+            if _should_retry(current, e, attempt, started):
+                continue
+            if started:
+                raise _interrupted(current, e) from e
+            return
+        finally:
+            stream.close()
+
+        _breakers.get(current).record_success()
+        return
+
+
+def _stream_payload(
+    prompt: str,
+    system_prompt: Optional[str],
+    selected_model: str,
+    max_tokens: Optional[int] = None,
+) -> Dict:
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
     messages.append({"role": "user", "content": prompt})
 
-    payload = {
+    return {
         "model": selected_model,
         "messages": messages,
         "temperature": 0.7,
-        "max_tokens": 2048,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
         "stream": True,
     }
 
+
+def _stream_once(
+    prompt: str,
+    system_prompt: Optional[str],
+    selected_model: str,
+    max_tokens: Optional[int] = None,
+) -> Generator[str, None, None]:
+    """One streaming attempt; raises on request or transport failure"""
+    payload = _stream_payload(prompt, system_prompt, selected_model, max_tokens)
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json",
     }
 
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    outcome = "cancelled"
     try:
-        with requests.post(
+        with get_http_client().stream(
+            "POST",
             f"{GROQ_API_URL}/chat/completions",
             json=payload,
             headers=headers,
-            timeout=12,
-            stream=True,
         ) as r:
+            _record_rate_limit(selected_model, r)
             r.raise_for_status()
 
-            for line in r.iter_lines(decode_unicode=True):
-                if not line or not line.startswith("data: "):
-                    continue
+            for token in iter_content(r.iter_bytes()):
+                if first is None:
+                    first = time.perf_counter()
+                    GROQ_TTFT.observe(first - start, model=selected_model)
+                tokens += 1
+                yield token
 
-                data_str = line[6:]
-                if data_str == "[DONE]":
-                    break
-
-                try:
-                    data = json.loads(data_str)
-                    delta = data["choices"][0].get("delta", {})
-                    token = delta.get("content")
-                    if token:
-                        yield token
-                except Exception:
-                    continue
+        outcome = "ok"
 
     except Exception:
+        outcome = "error"
+        raise
+    finally:
+        _record_stream(selected_model, start, first, tokens, outcome)
+
+
+async def groq_response_streaming_async(
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    model: Optional[str] = None,
+    hedge: Optional[bool] = None,
+    max_tokens: Optional[int] = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Async twin of groq_response_streaming.
+    Awaits the socket instead of blocking a threadpool thread,
+    so one event loop can hold many open streams.
+    With hedging on (GROQ_HEDGE or hedge=True) a stalled first token
+    triggers a backup request; see _hedged_stream_async.
+    """
+    if not GROQ_API_KEY or not GROQ_ENABLED:
         return
 
+    selected_model = model or GROQ_MODEL
+    if not validate_model(selected_model):
+        return
+
+    if GROQ_HEDGE if hedge is None else hedge:
+        stream = _hedged_stream_async(prompt, system_prompt, selected_model, max_tokens)
+    else:
+        stream = _stream_async(prompt, system_prompt, selected_model, max_tokens=max_tokens)
+
+    async for token in stream:
+        yield token
+
+
+async def _stream_async(
+    prompt: str,
+    system_prompt: Optional[str],
+    selected_model: str,
+    max_wait: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Stream with breaker checks and backoff retries before the first token;
+    a failure after it raises StreamInterrupted
+    """
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(_retry_delay(attempt))
+
+        current = _pick_model(selected_model)
+        if current is None:
+            GROQ_REQUESTS.inc(model=selected_model, outcome="circuit_open")
+            return
+
+        if not await _rate_limiter.acquire_async(
+            current, _prompt_tokens(prompt, system_prompt), max_wait=max_wait
+        ):
+            GROQ_REQUESTS.inc(model=current, outcome="rate_limited")
+            return
+
+        started = False
+        stream = _stream_once_async(prompt, system_prompt, current, max_tokens)
+        try:
+            async for token in stream:
+                if not started:
+                    started = True
+                    _breakers.get(current).record_success()
+                yield token
+        except Exception as e:
+            if _should_retry(current, e, attempt, started):
+                continue
+            if started:
+                raise _interrupted(current, e) from e
+            return
+        finally:
+            await stream.aclose()
+
+        _breakers.get(current).record_success()
+        return
+
+
+async def _stream_once_async(
+    prompt: str,
+    system_prompt: Optional[str],
+    selected_model: str,
+    max_tokens: Optional[int] = None,
+) -> AsyncGenerator[str, None]:
+    payload = _stream_payload(prompt, system_prompt, selected_model, max_tokens)
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    outcome = "cancelled"
+    try:
+        async with _get_async_client().stream(
+            "POST",
+            f"{GROQ_API_URL}/chat/completions",
+            json=payload,
+            headers=headers,
+        ) as r:
+            _record_rate_limit(selected_model, r)
+            r.raise_for_status()
+
+            async for token in aiter_content(r.aiter_bytes()):
+                if first is None:
+                    first = time.perf_counter()
+                    GROQ_TTFT.observe(first - start, model=selected_model)
+                tokens += 1
+                yield token
+
+        outcome = "ok"
+
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        _record_stream(selected_model, start, first, tokens, outcome)
+
+
+# ---------------------------------------
+# Hedged streaming (tail-latency control)
+# ---------------------------------------
+async def _first_token(stream) -> Optional[str]:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def hedge_delay(model: str) -> float:
+    """Wait this long for a first token before hedging: observed p95 TTFT, clamped"""
+    if GROQ_TTFT.count(model=model) < GROQ_HEDGE_MIN_SAMPLES:
+        return GROQ_HEDGE_DEFAULT_DELAY
+    p95 = GROQ_TTFT.quantile(0.95, last=200, model=model)
+    return min(max(p95, GROQ_HEDGE_MIN_DELAY), GROQ_HEDGE_MAX_DELAY)
+
+
+async def _hedged_stream_async(
+    prompt: str,
+    system_prompt: Optional[str],
+    selected_model: str,
+    max_tokens: Optional[int] = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Start the primary stream; if it has produced no token after
+    hedge_delay(), start a backup on GROQ_HEDGE_MODEL (or the same model).
+    Whichever stream yields a token first is relayed, the other is cancelled.
+    """
+    backup_model = GROQ_HEDGE_MODEL if validate_model(GROQ_HEDGE_MODEL) else selected_model
+    streams = {"primary": _stream_async(prompt, system_prompt, selected_model, max_tokens=max_tokens)}
+    firsts = {"primary": asyncio.ensure_future(_first_token(streams["primary"]))}
+    winner = None
+    token = None
+
+    try:
+        done, _ = await asyncio.wait(set(firsts.values()), timeout=hedge_delay(selected_model))
+        if done:
+            winner, token = "primary", firsts["primary"].result()
+        else:
+            GROQ_HEDGES.inc(model=selected_model)
+            # The backup never waits on the local rate limiter: it only helps if it starts now
+            streams["backup"] = _stream_async(
+                prompt, system_prompt, backup_model, max_wait=0, max_tokens=max_tokens
+            )
+            firsts["backup"] = asyncio.ensure_future(_first_token(streams["backup"]))
+
+            pending = set(firsts.values())
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for name, task in firsts.items():
+                    if task in done and task.result() is not None and winner is None:
+                        winner, token = name, task.result()
+            GROQ_HEDGE_WINS.inc(model=selected_model, winner=winner or "none")
+
+        # Drop the loser before relaying the winner
+        for name, task in firsts.items():
+            if name != winner:
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    await streams[name].aclose()
+
+        if winner is None or token is None:
+            return
+
+        yield token
+        async for token in streams[winner]:
+            yield token
+
+    finally:
+        for name, task in firsts.items():
+            task.cancel()
+        for stream in streams.values():
+            try:
+                await stream.aclose()
+            except RuntimeError:
+                # aclose() on a generator whose pending __anext__ was just cancelled
+                pass
+
+
+# ---------------------------------------
+# Batch generation (offline jobs)
+# ---------------------------------------
+def _batch_job(index: int, item: Union[str, Dict], defaults: Dict) -> Dict:
+    if isinstance(item, str):
+        item = {"prompt": item}
+    job = {
+        "index": index,
+        "id": item.get("id"),
+        "prompt": item["prompt"],
+        "system_prompt": item.get("system_prompt", defaults["system_prompt"]),
+        "model": item.get("model") or defaults["model"] or GROQ_MODEL,
+        "max_tokens": item.get("max_tokens", defaults["max_tokens"]),
+    }
+    if job["id"] is not None:
+        job["key"] = str(job["id"])
+    else:
+        identity = json.dumps(
+            [job["model"], job["system_prompt"], job["max_tokens"], job["prompt"]]
+        )
+        job["key"] = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+    return job
+
+
+def _load_checkpoint(path: Optional[str]) -> Dict[str, str]:
+    """key -> response for every job recorded in a checkpoint file"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted run
+            done[record["key"]] = record["response"]
+    return done
+
+
+def groq_batch(
+    prompts: Iterable[Union[str, Dict]],
+    system_prompt: Optional[str] = None,
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    concurrency: int = GROQ_BATCH_CONCURRENCY,
+    ordered: bool = True,
+    checkpoint: Optional[str] = None,
+    max_wait: float = GROQ_BATCH_MAX_WAIT,
+) -> Iterator[Dict]:
+    """
+    Run many completions with at most `concurrency` in flight.
+
+    `prompts` may be strings or dicts with "prompt" plus optional "id",
+    "system_prompt", "model" and "max_tokens" overriding the defaults.
+    It is consumed lazily, so it can be a generator over a large dataset.
+
+    Yields one dict per prompt (index, id, key, prompt, ..., response,
+    seconds, cached), in input order when `ordered` else as each
+    completes. Every call goes through groq_response, so it shares the
+    rate limiter, retries and circuit breakers; `max_wait` is how long a
+    job may queue on the limiter. A failed job has response None.
+
+    With `checkpoint` set, successful responses are appended to that
+    JSONL file as they finish; rerunning with the same file replays
+    them (cached=True) instead of calling Groq again. Jobs are matched
+    by "id", or by a hash of model, system prompt, max_tokens and prompt.
+    """
+    defaults = {"system_prompt": system_prompt, "model": model, "max_tokens": max_tokens}
+    done = _load_checkpoint(checkpoint)
+    items = enumerate(prompts)
+    concurrency = max(concurrency, 1)
+    window = concurrency * 4  # ordered mode: cap on results held back
+    pending: Dict[Future, Dict] = {}
+    buffered: Dict[int, Dict] = {}
+    submitted = 0
+    next_index = 0
+    exhausted = False
+
+    def run(job: Dict) -> Dict:
+        start = time.perf_counter()
+        job["response"] = groq_response(
+            job["prompt"],
+            system_prompt=job["system_prompt"],
+            model=job["model"],
+            max_tokens=job["max_tokens"],
+            max_wait=max_wait,
+        )
+        job["seconds"] = round(time.perf_counter() - start, 3)
+        return job
+
+    out = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="groq-batch")
+    try:
+        while True:
+            finished = []
+            while (
+                not exhausted
+                and len(pending) < concurrency
+                and (not ordered or submitted - next_index < window)
+            ):
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                submitted += 1
+                job = _batch_job(index, item, defaults)
+                if job["key"] in done:
+                    job.update(response=done[job["key"]], seconds=0.0, cached=True)
+                    finished.append(job)
+                else:
+                    job["cached"] = False
+                    pending[pool.submit(run, job)] = job
+
+            if pending and not finished:
+                ready, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in ready:
+                    pending.pop(future)
+                    finished.append(future.result())
+
+            for job in finished:
+                if out is not None and not job["cached"] and job["response"] is not None:
+                    out.write(json.dumps(
+                        {"key": job["key"], "index": job["index"], "response": job["response"]}
+                    ) + "\n")
+                    out.flush()
+                if ordered:
+                    buffered[job["index"]] = job
+                else:
+                    yield job
+
+            while next_index in buffered:
+                yield buffered.pop(next_index)
+                next_index += 1
+
+            if exhausted and not pending and not buffered:
+                return
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if out is not None:
+            out.close()
+
 
 # ---------------------------------------
 # Diagnostics
@@ -196,7 +867,7 @@ def check_groq_api_key() -> Dict:
         return {"valid": False, "message": "Missing GROQ_API_KEY"}
 
     try:
-        r = requests.get(
+        r = get_http_client().get(
             f"{GROQ_API_URL}/models",
             headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
             timeout=8,
@@ -216,5 +887,20 @@ def get_groq_status() -> Dict:
         "default_model": GROQ_MODEL,
         "model_valid": validate_model(GROQ_MODEL),
         "rate_limit": get_rate_limit_status(),
+        "http": {
+            "http2": GROQ_HTTP2 and HTTP2_AVAILABLE,
+            "pool_size": GROQ_POOL_SIZE,
+            "keepalive_expiry": GROQ_KEEPALIVE_EXPIRY,
+        },
+        "hedging": {
+            "enabled": GROQ_HEDGE,
+            "backup_model": GROQ_HEDGE_MODEL or "same",
+            "delay": hedge_delay(GROQ_MODEL),
+        },
+        "resilience": {
+            "max_retries": GROQ_MAX_RETRIES,
+            "fallback_model": GROQ_FALLBACK_MODEL or None,
+            "breakers": _breakers.status(),
+        },
         "api_status": api_check,
     }
@@ -1,6 +1,5 @@
-from database import Base, engine
-from models import Chat, Message
+from database import init_db
 
 print("Creating database tables...")
-Base.metadata.create_all(bind=engine)
+init_db()
 print("Done!")
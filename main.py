@@ -3,7 +3,7 @@ import requests
 from dotenv import load_dotenv
 import pickle
 from datetime import datetime
-from web_search import search_web, fetch_page
+from web_search import SearchOverloaded, search_web, fetch_pages
 from request_classifier import RequestClassifier
 from knowledge_base import kb
 from custom_rules import rules_engine
@@ -42,11 +42,19 @@ SYSTEM_PROMPT = load_system_prompt()
 
 
 # Lazy-load Groq client (ultra-fast cloud inference!)
-def get_groq_response(prompt, system_prompt=None):
-    """Safely call Groq with system prompt injection"""
+def get_groq_response(prompt, system_prompt=None, category=None, model=None):
+    """Safely call Groq with system prompt injection (routes unless `model` is given)"""
     try:
         from groq_client import groq_response
-        result = groq_response(prompt, system_prompt=system_prompt)
+        from model_router import router
+        from prompt_builder import max_tokens_for
+        category = category or router.classifier.classify(prompt)
+        result = groq_response(
+            prompt,
+            system_prompt=system_prompt,
+            model=model or router.route(prompt, category=category),
+            max_tokens=max_tokens_for(category),
+        )
         if result is None:
             return "Sorry, I'm having trouble processing your request right now. Please try again in a moment."
         return result
@@ -56,23 +64,31 @@ def get_groq_response(prompt, system_prompt=None):
         print(f"  [GROQ TRACEBACK] {traceback.format_exc()}")
         return "Sorry, I'm having trouble processing your request right now. Please try again in a moment."
 
-def get_groq_response_streaming(prompt, system_prompt=None):
+def get_groq_response_streaming(prompt, system_prompt=None, category=None, model=None):
     """Stream response from Groq with system prompt injection (ultra-fast!)"""
     try:
         from groq_client import groq_response_streaming
-        return groq_response_streaming(prompt, system_prompt=system_prompt)
+        from model_router import router
+        from prompt_builder import max_tokens_for
+        category = category or router.classifier.classify(prompt)
+        return groq_response_streaming(
+            prompt,
+            system_prompt=system_prompt,
+            model=model or router.route(prompt, category=category),
+            max_tokens=max_tokens_for(category),
+        )
     except Exception as e:
         print(f"  Groq streaming unavailable: {e}")
         return []
 
 # Groq is the exclusive inference engine
-def get_ai_response(prompt, system_prompt=None, mode="online"):
+def get_ai_response(prompt, system_prompt=None, mode="online", category=None, model=None):
     """Get AI response from Groq (ultra-fast cloud inference)"""
-    return get_groq_response(prompt, system_prompt=system_prompt)
+    return get_groq_response(prompt, system_prompt=system_prompt, category=category, model=model)
 
-def get_ai_response_streaming(prompt, system_prompt=None, mode="online"):
+def get_ai_response_streaming(prompt, system_prompt=None, mode="online", category=None, model=None):
     """Stream AI response from Groq (ultra-fast cloud inference)"""
-    return get_groq_response_streaming(prompt, system_prompt=system_prompt)
+    return get_groq_response_streaming(prompt, system_prompt=system_prompt, category=category, model=model)
 
 # GREETING KEYWORDS (for detection only)
 GREETING_KEYWORDS = [
@@ -278,37 +294,51 @@ def handle_web_search_request(user_input):
     """
     print("  [DOMAIN ROUTING] Web search needed - fetching live data")
     
-    sources = search_web(user_input, max_results=5)
+    try:
+        sources = search_web(user_input, max_results=5)
+    except SearchOverloaded:
+        return "Web search is busy right now. Please try again in a moment.", {"is_valid": False, "confidence_level": "LOW", "issues": ["Search overloaded"], "sources_verified": False}
     
     if not sources:
         return "I couldn't retrieve live information.", {"is_valid": False, "confidence_level": "LOW", "issues": ["No sources found"], "sources_verified": False}
     
-    # Synthesize information from multiple sources
-    synthesized_data = ""
-    citations = []
-    
-    for i, src in enumerate(sources[:3], 1):  # Use top 3 sources
-        page_content = fetch_page(src["url"])
-        if page_content:
-            synthesized_data += f"\n[Source {i}: {src.get('title', 'Untitled')}]\n{page_content[:1500]}\n"
-            citations.append(src["url"])
+    # Fetch every candidate at once; keep the first 3 that extract cleanly
+    titles = {src["url"]: src.get("title", "Untitled") for src in sources}
+    pages = fetch_pages([src["url"] for src in sources], want=3)
     
-    if not synthesized_data:
+    if not pages:
         return "Unable to fetch content from sources.", {"is_valid": False, "confidence_level": "LOW", "issues": ["Content fetch failed"], "sources_verified": False}
     
-    # Use synthesis prompt to create cohesive answer
-    synthesis_prompt = f"""Using the following sources, provide a comprehensive, well-synthesized answer to the question:
+    # Use synthesis prompt to create cohesive answer, with as much of the
+    # most relevant source text as the token budget allows
+    from prompt_builder import build_prompt
+    from model_router import router
+    
+    synthesis_system_prompt = """You are an information synthesis expert. Combine information from multiple sources into a clear, coherent answer. Eliminate redundancy and highlight key insights."""
+    
+    category = classifier.classify(user_input)
+    # Route once: the prompt is sized for this model, so it must also answer
+    model = router.route(user_input, category=category)
+    built = build_prompt(
+        user_input,
+        model=model,
+        category=category,
+        system_prompt=synthesis_system_prompt,
+        sources=[(titles[url], page_content) for url, page_content in pages],
+        template="""Using the following sources, provide a comprehensive, well-synthesized answer to the question:
 
-Question: {user_input}
+Question: {question}
 
 Sources:
-{synthesized_data}
+{context}
 
-Create a coherent answer that combines information from all sources, avoiding repetition."""
-    
-    synthesis_system_prompt = """You are an information synthesis expert. Combine information from multiple sources into a clear, coherent answer. Eliminate redundancy and highlight key insights."""
+Create a coherent answer that combines information from all sources, avoiding repetition.""",
+        source_template="[Source {n}: {title}]\n{text}",
+        separator="\n\n",
+    )
+    citations = [pages[i][0] for i in built.sources_used]
     
-    answer = get_ai_response(synthesis_prompt, system_prompt=synthesis_system_prompt)
+    answer = get_ai_response(built.prompt, system_prompt=synthesis_system_prompt, category=category, model=model)
     
     if citations:
         answer += "\n\nSources:\n" + "\n".join(citations)
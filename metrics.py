@@ -0,0 +1,211 @@
+"""
+Lightweight Metrics
+Counters, gauges and latency summaries (p50/p95/p99) rendered
+in the Prometheus text exposition format. Stdlib only.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+# Observations kept per label set for quantile estimates
+METRICS_RESERVOIR = int(os.getenv("METRICS_RESERVOIR", "2048"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+# =========================
+# HELPERS
+# =========================
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict) -> Tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], key: Tuple, extra: Optional[Dict] = None) -> str:
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+# =========================
+# METRIC TYPES
+# =========================
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a callback"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_label_key(self.labelnames, labels)] = value
+
+    def render(self):
+        if self.fn is not None:
+            yield f"{self.name} {_format_value(self.fn())}"
+            return
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class _Series:
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples = deque(maxlen=METRICS_RESERVOIR)
+        self.count = 0
+        self.total = 0.0
+
+
+class Histogram:
+    """
+    Latency distribution exported as a Prometheus summary.
+    Quantiles come from the most recent METRICS_RESERVOIR observations;
+    _sum and _count cover the whole process lifetime.
+    """
+
+    kind = "summary"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.samples.append(value)
+            series.count += 1
+            series.total += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, last: Optional[int] = None, **labels) -> Optional[float]:
+        """q-quantile of recent observations (optionally only the `last` N), or None if there are none"""
+        series = self._series.get(_label_key(self.labelnames, labels))
+        if series is None or not series.samples:
+            return None
+        with self._lock:
+            samples = list(series.samples)
+        if last:
+            samples = samples[-last:]
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series.count if series else 0
+
+    def render(self):
+        with self._lock:
+            items = [(k, sorted(s.samples), s.count, s.total) for k, s in self._series.items()]
+        for key, ordered, count, total in items:
+            for q in QUANTILES:
+                if ordered:
+                    value = ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+                    yield f"{self.name}{_format_labels(self.labelnames, key, {'quantile': q})} {_format_value(value)}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+# =========================
+# REGISTRY
+# =========================
+
+class Registry:
+    """Process-wide metric registry; re-registering a name returns the existing metric"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+              fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge, name, help, labelnames, fn=fn)
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        return self._register(Histogram, name, help, labelnames)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
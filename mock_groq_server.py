@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Mock Groq Server
+Local stand-in for Groq's OpenAI-compatible API, for offline and
+reproducible benchmarking. Implements /openai/v1/models and
+/openai/v1/chat/completions (streaming and non-streaming) with
+configurable TTFT, tokens/s, error rate, 429 injection and an optional
+request/token budget that reports real x-ratelimit-* headers.
+
+    python mock_groq_server.py --port 8090 --ttft 0.25 --tps 400
+    GROQ_API_URL=http://127.0.0.1:8090/openai/v1 GROQ_API_KEY=mock python app.py
+
+Settings can also be changed while running via POST /mock/config.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from rate_limit import TokenBucket, estimate_tokens
+
+# =========================
+# CONFIGURATION
+# =========================
+
+config = {
+    "ttft": float(os.getenv("MOCK_GROQ_TTFT", "0.2")),             # seconds to first token
+    "ttft_jitter": float(os.getenv("MOCK_GROQ_TTFT_JITTER", "0.0")),  # +/- uniform seconds
+    "tokens_per_second": float(os.getenv("MOCK_GROQ_TPS", "500")),
+    "completion_tokens": int(os.getenv("MOCK_GROQ_TOKENS", "200")),  # capped by max_tokens
+    "error_rate": float(os.getenv("MOCK_GROQ_ERROR_RATE", "0")),     # fraction answered with 503
+    "rate_limit_rate": float(os.getenv("MOCK_GROQ_429_RATE", "0")),  # fraction answered with 429
+    "retry_after": float(os.getenv("MOCK_GROQ_RETRY_AFTER", "1")),
+    "requests_per_minute": int(os.getenv("MOCK_GROQ_RPM", "0")),     # 0 = unlimited
+    "tokens_per_minute": int(os.getenv("MOCK_GROQ_TPM", "0")),       # 0 = unlimited
+    "seed": int(os.getenv("MOCK_GROQ_SEED", "0")),
+}
+
+MODELS = ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768"]
+
+_WORDS = (
+    "the a of to and in is that for it as with on be by this are from at or an "
+    "which can data model request latency stream token server client cache network "
+    "response system value time first each more when one will use also into other "
+    "performance budget queue window result answer source process thread"
+).split()
+
+app = FastAPI(title="Mock Groq API")
+_rng = random.Random(config["seed"])
+_budget: Dict[str, TokenBucket] = {}
+stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+
+# =========================
+# HELPERS
+# =========================
+
+def _reset_budget() -> None:
+    _budget.clear()
+    if config["requests_per_minute"]:
+        _budget["requests"] = TokenBucket(config["requests_per_minute"], config["requests_per_minute"] / 60)
+    if config["tokens_per_minute"]:
+        _budget["tokens"] = TokenBucket(config["tokens_per_minute"], config["tokens_per_minute"] / 60)
+
+
+def _error(status: int, message: str, type_: str, code: str, headers: Dict = None) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": message, "type": type_, "code": code}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def _take_budget(prompt_tokens: int) -> Dict:
+    """Spend from the budget; returns x-ratelimit-* headers (+ retry-after when exhausted)"""
+    now = time.monotonic()
+    wanted = {"requests": 1, "tokens": prompt_tokens}
+    buckets = dict(_budget)
+    for bucket in buckets.values():
+        bucket.refill(now)
+
+    wait = max((b.wait_time(wanted[k]) for k, b in buckets.items()), default=0)
+    if wait <= 0:
+        for kind, bucket in buckets.items():
+            bucket.tokens -= min(wanted[kind], bucket.capacity)
+
+    headers = {}
+    for kind, bucket in buckets.items():
+        headers[f"x-ratelimit-limit-{kind}"] = str(int(bucket.capacity))
+        headers[f"x-ratelimit-remaining-{kind}"] = str(max(int(bucket.tokens), 0))
+        headers[f"x-ratelimit-reset-{kind}"] = f"{(bucket.capacity - bucket.tokens) / bucket.refill_per_second:.2f}s"
+    if wait > 0:
+        headers["retry-after"] = str(max(int(wait + 0.999), 1))
+    return headers
+
+
+def _completion_words(messages, count: int):
+    """Deterministic output: the same prompt always yields the same tokens"""
+    digest = hashlib.sha1(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+    rng = random.Random(f"{config['seed']}:{digest}")
+    return [("" if i == 0 else " ") + rng.choice(_WORDS) for i in range(count)]
+
+
+async def _sleep_until(target: float) -> None:
+    delay = target - time.perf_counter()
+    if delay > 0.001:
+        await asyncio.sleep(delay)
+
+
+def _chunk(completion_id: str, created: int, model: str, delta: Dict,
+           finish_reason=None, x_groq: Dict = None) -> bytes:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "system_fingerprint": "fp_mock",
+        "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+    }
+    if x_groq:
+        body["x_groq"] = x_groq
+    return b"data: " + json.dumps(body, separators=(",", ":")).encode("utf-8") + b"\n\n"
+
+# =========================
+# ROUTES
+# =========================
+
+@app.get("/openai/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [{"id": m, "object": "model", "owned_by": "mock", "active": True} for m in MODELS],
+    }
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    stats["requests"] += 1
+    if not request.headers.get("authorization", "").startswith("Bearer "):
+        return _error(401, "Invalid API Key", "invalid_request_error", "invalid_api_key")
+
+    body = await request.json()
+    model = body.get("model")
+    if model not in MODELS:
+        return _error(404, f"The model `{model}` does not exist", "invalid_request_error", "model_not_found")
+
+    messages = body.get("messages") or []
+    prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+    headers = _take_budget(prompt_tokens)
+
+    if "retry-after" in headers or _rng.random() < config["rate_limit_rate"]:
+        stats["rate_limited"] += 1
+        headers.setdefault("retry-after", str(config["retry_after"]))
+        return _error(
+            429, f"Rate limit reached for model `{model}`", "requests", "rate_limit_exceeded", headers
+        )
+    if _rng.random() < config["error_rate"]:
+        stats["errors"] += 1
+        return _error(503, "Service Unavailable", "internal_server_error", "service_unavailable", headers)
+
+    count = min(config["completion_tokens"], int(body.get("max_tokens") or config["completion_tokens"]))
+    words = _completion_words(messages, count)
+    ttft = max(config["ttft"] + _rng.uniform(-config["ttft_jitter"], config["ttft_jitter"]), 0)
+    tps = max(config["tokens_per_second"], 1e-3)
+    completion_id = f"chatcmpl-{uuid.uuid4()}"
+    created = int(time.time())
+    request_id = f"req_{uuid.uuid4().hex[:26]}"
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": count,
+        "total_tokens": prompt_tokens + count,
+        "completion_time": round(count / tps, 3),
+        "total_time": round(ttft + count / tps, 3),
+    }
+
+    if not body.get("stream"):
+        await asyncio.sleep(ttft + count / tps)
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "system_fingerprint": "fp_mock",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(words)},
+                "logprobs": None,
+                "finish_reason": "length" if count == body.get("max_tokens") else "stop",
+            }],
+            "usage": usage,
+            "x_groq": {"id": request_id},
+        }, headers=headers)
+
+    async def stream():
+        stats["streams"] += 1
+        start = time.perf_counter()
+        yield _chunk(completion_id, created, model, {"role": "assistant", "content": ""},
+                     x_groq={"id": request_id})
+        for i, word in enumerate(words):
+            await _sleep_until(start + ttft + i / tps)
+            yield _chunk(completion_id, created, model, {"content": word})
+        yield _chunk(completion_id, created, model, {}, "stop", x_groq={"id": request_id, "usage": usage})
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+
+@app.get("/mock/config")
+async def get_config():
+    return {"config": config, "stats": stats}
+
+
+@app.post("/mock/config")
+async def set_config(request: Request):
+    """Change settings on the fly, e.g. {"error_rate": 0.2} mid load test"""
+    updates = await request.json()
+    unknown = [key for key in updates if key not in config]
+    if unknown:
+        return JSONResponse({"error": f"Unknown settings: {unknown}"}, status_code=400)
+    for key, value in updates.items():
+        config[key] = type(config[key])(value)
+    if "seed" in updates:
+        _rng.seed(config["seed"])
+    if "requests_per_minute" in updates or "tokens_per_minute" in updates:
+        _reset_budget()
+    return {"config": config}
+
+
+_reset_budget()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Groq API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_GROQ_PORT", "8090")))
+    parser.add_argument("--ttft", type=float, help="seconds to first token")
+    parser.add_argument("--ttft-jitter", type=float)
+    parser.add_argument("--tps", type=float, dest="tokens_per_second", help="streamed tokens per second")
+    parser.add_argument("--tokens", type=int, dest="completion_tokens", help="tokens per completion")
+    parser.add_argument("--error-rate", type=float, help="fraction of requests answered with 503")
+    parser.add_argument("--429-rate", type=float, dest="rate_limit_rate", help="fraction answered with 429")
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--rpm", type=int, dest="requests_per_minute", help="enforced requests/minute")
+    parser.add_argument("--tpm", type=int, dest="tokens_per_minute", help="enforced prompt tokens/minute")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    for key, value in vars(args).items():
+        if key in config and value is not None:
+            config[key] = value
+    _rng.seed(config["seed"])
+    _reset_budget()
+
+    print(f"Mock Groq API on http://{args.host}:{args.port}/openai/v1", file=sys.stderr)
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,150 @@
+"""
+Model Routing
+Picks a Groq model per request from the classifier category,
+then demotes models whose live TTFT / throughput has degraded
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+
+import metrics
+from groq_client import (
+    AVAILABLE_MODELS,
+    GROQ_MODEL,
+    GROQ_TTFT,
+    GROQ_TOKENS_PER_SECOND,
+    is_available,
+    validate_model,
+)
+from request_classifier import RequestClassifier
+
+# =========================
+# CONFIGURATION
+# =========================
+
+FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "llama-3.1-8b-instant")
+CAPABLE_MODEL = os.getenv("ROUTER_CAPABLE_MODEL", "llama-3.3-70b-versatile")
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() in ("true", "1", "yes")
+
+# Questions shorter than this in the 'general' bucket count as short factual
+SHORT_QUERY_CHARS = int(os.getenv("ROUTER_SHORT_QUERY_CHARS", "80"))
+# Observations needed before a model can be judged, and how many recent ones are judged
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))
+# How long a degraded model sits out before it is probed again
+ROUTER_DEMOTION_SECONDS = float(os.getenv("ROUTER_DEMOTION_SECONDS", "60"))
+# Floor on median streaming throughput
+ROUTER_MIN_TOKENS_PER_SECOND = float(os.getenv("ROUTER_MIN_TOKENS_PER_SECOND", "20"))
+
+# p95 TTFT budget by the speed label in AVAILABLE_MODELS
+TTFT_BUDGETS = {
+    "ultra_fast": float(os.getenv("ROUTER_TTFT_BUDGET_FAST", "1.0")),
+    "very_fast": float(os.getenv("ROUTER_TTFT_BUDGET", "2.5")),
+    "fast": float(os.getenv("ROUTER_TTFT_BUDGET", "2.5")),
+}
+
+# Categories from RequestClassifier.classify -> preferred tier
+FAST_CATEGORIES = {"greeting", "capabilities", "translation"}
+CAPABLE_CATEGORIES = {"code", "essay", "math", "analysis", "design", "creative", "howto"}
+
+ROUTER_DECISIONS = metrics.counter(
+    "router_decisions_total", "Model routing decisions", ("category", "model")
+)
+ROUTER_DEMOTIONS = metrics.counter(
+    "router_demotions_total", "Models demoted for degraded latency", ("model",)
+)
+
+
+class ModelRouter:
+    """Category-based model choice with latency-driven demotion"""
+
+    def __init__(self):
+        self.classifier = RequestClassifier()
+        self._demoted: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, category: str, prompt: str) -> List[str]:
+        """Models in order of preference for this request"""
+        if category in FAST_CATEGORIES or (
+            category == "general" and len(prompt) < SHORT_QUERY_CHARS
+        ):
+            order = [FAST_MODEL, CAPABLE_MODEL]
+        elif category in CAPABLE_CATEGORIES:
+            order = [CAPABLE_MODEL, GROQ_MODEL, FAST_MODEL]
+        else:
+            order = [CAPABLE_MODEL, FAST_MODEL]
+
+        seen = []
+        for model in order:
+            if validate_model(model) and model not in seen:
+                seen.append(model)
+        return seen or [GROQ_MODEL]
+
+    def is_healthy(self, model: str) -> bool:
+        """
+        Judge a model on observations made since its last demotion.
+        A model without enough fresh samples is assumed healthy so it
+        gets probed with real traffic. A model whose circuit breaker is
+        open is never healthy.
+        """
+        if not is_available(model):
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            state = self._demoted.get(model)
+            if state and now < state["until"]:
+                return False
+
+            seen = GROQ_TTFT.count(model=model)
+            fresh = seen - (state["count"] if state else 0)
+            if fresh < ROUTER_MIN_SAMPLES:
+                return True
+
+            last = min(fresh, ROUTER_WINDOW)
+            p95_ttft = GROQ_TTFT.quantile(0.95, last=last, model=model)
+            p50_tps = GROQ_TOKENS_PER_SECOND.quantile(0.5, last=last, model=model)
+            budget = TTFT_BUDGETS.get(AVAILABLE_MODELS[model]["speed"], 2.5)
+
+            if p95_ttft > budget or (p50_tps is not None and p50_tps < ROUTER_MIN_TOKENS_PER_SECOND):
+                self._demoted[model] = {
+                    "until": now + ROUTER_DEMOTION_SECONDS,
+                    "count": seen,
+                    "p95_ttft": round(p95_ttft, 3),
+                    "p50_tps": round(p50_tps, 1) if p50_tps is not None else None,
+                }
+                ROUTER_DEMOTIONS.inc(model=model)
+                return False
+            return True
+
+    def route(self, prompt: str, category: Optional[str] = None) -> str:
+        """Pick the model for one request"""
+        if not ROUTER_ENABLED:
+            return GROQ_MODEL
+
+        category = category or self.classifier.classify(prompt)
+        candidates = self.candidates(category, prompt)
+        # If every candidate is degraded, fall back to the first preference
+        model = next((m for m in candidates if self.is_healthy(m)), candidates[0])
+        ROUTER_DECISIONS.inc(category=category, model=model)
+        return model
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "enabled": ROUTER_ENABLED,
+            "models": {
+                model: {
+                    "p95_ttft": GROQ_TTFT.quantile(0.95, last=ROUTER_WINDOW, model=model),
+                    "p50_tokens_per_second": GROQ_TOKENS_PER_SECOND.quantile(0.5, last=ROUTER_WINDOW, model=model),
+                    "available": is_available(model),
+                    "demoted_for": round(max(self._demoted.get(model, {}).get("until", 0) - now, 0), 1),
+                }
+                for model in AVAILABLE_MODELS
+            },
+        }
+
+
+router = ModelRouter()
@@ -65,6 +65,11 @@ class Chat(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     is_guest = Column(Boolean, default=False)  # True if guest user
 
+    # Rolling summary of older messages, used as conversation context
+    summary = Column(Text, nullable=True)
+    summary_upto = Column(Integer, default=0)  # id of the last message folded into summary
+    summary_updated_at = Column(DateTime, nullable=True)
+
     user = relationship("User", back_populates="chats")
     messages = relationship("Message", back_populates="chat", cascade="all, delete")
 
@@ -0,0 +1,274 @@
+"""
+Prompt Builder
+Counts tokens locally and assembles prompts that fit a token budget,
+filling by priority: system prompt, question, conversation history,
+then the best-ranked source passages. Also picks max_tokens from the
+request category.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken is optional; without it we use a conservative heuristic
+    _ENCODING = None
+
+# =========================
+# CONFIGURATION
+# =========================
+
+# Upper bound on prompt tokens we are willing to pay for, whatever the context window
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "3000"))
+# Source text is cut into passages of roughly this many tokens before ranking
+PROMPT_PASSAGE_TOKENS = int(os.getenv("PROMPT_PASSAGE_TOKENS", "120"))
+# Any single earlier message is cut to this many tokens in the history block
+PROMPT_TURN_TOKENS = int(os.getenv("PROMPT_TURN_TOKENS", "300"))
+DEFAULT_CONTEXT_TOKENS = 8192
+DEFAULT_MAX_TOKENS = int(os.getenv("GROQ_MAX_TOKENS", "2048"))
+
+# Completion budget per RequestClassifier category
+MAX_TOKENS_BY_CATEGORY = {
+    "greeting": 128,
+    "capabilities": 384,
+    "translation": 512,
+    "general": 768,
+    "math": 1024,
+    "howto": 1024,
+    "analysis": 1536,
+    "design": 1536,
+    "creative": 1536,
+    "code": 2048,
+    "essay": 2048,
+}
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"[a-z0-9]{3,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "what", "who", "how", "why", "when",
+    "where", "which", "does", "did", "with", "this", "that", "from", "about",
+    "can", "you", "your", "tell", "explain", "please", "there", "their",
+}
+
+# =========================
+# TOKEN COUNTING
+# =========================
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, else a slight over-estimate"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    # ~1 token per short word or symbol, longer words split every 6 characters
+    return sum(1 + len(piece) // 6 for piece in _PIECE.findall(text))
+
+
+def truncate_to_tokens(text: str, limit: int) -> str:
+    """Longest prefix of `text` (cut at a word boundary) within `limit` tokens"""
+    if limit <= 0:
+        return ""
+    if count_tokens(text) <= limit:
+        return text
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:limit])
+
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= limit:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+def max_tokens_for(category: Optional[str]) -> int:
+    return MAX_TOKENS_BY_CATEGORY.get(category or "general", DEFAULT_MAX_TOKENS)
+
+
+def context_window(model: Optional[str]) -> int:
+    from groq_client import AVAILABLE_MODELS
+    return AVAILABLE_MODELS.get(model or "", {}).get("context", DEFAULT_CONTEXT_TOKENS)
+
+# =========================
+# PASSAGES
+# =========================
+
+def split_passages(text: str, size: int = PROMPT_PASSAGE_TOKENS) -> List[str]:
+    """Pack whole sentences into passages of about `size` tokens"""
+    passages, current, used = [], [], 0
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence)
+        if current and used + tokens > size:
+            passages.append(" ".join(current))
+            current, used = [], 0
+        current.append(sentence)
+        used += tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _terms(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def rank_passages(question: str, sources: Sequence[Tuple[str, str]]) -> List[Tuple[int, int, str]]:
+    """
+    Order passages as (source_index, position, text), best first.
+    Each source's best passage comes before any source's second-best,
+    so one long page cannot crowd out the others; within a round,
+    passages sharing more question terms win, then higher-ranked sources.
+    """
+    query = _terms(question)
+    per_source = []
+    for s, (_, text) in enumerate(sources):
+        scored = [
+            (-len(query & _terms(passage)), s, p, passage)
+            for p, passage in enumerate(split_passages(text))
+        ]
+        scored.sort()
+        per_source.append(scored)
+
+    ranked = []
+    for round_ in range(max((len(p) for p in per_source), default=0)):
+        batch = [passages[round_] for passages in per_source if round_ < len(passages)]
+        batch.sort()
+        ranked.extend((s, p, passage) for _, s, p, passage in batch)
+    return ranked
+
+# =========================
+# PROMPT ASSEMBLY
+# =========================
+
+class BuiltPrompt:
+    """A prompt that fits its budget, plus the max_tokens to request with it"""
+
+    def __init__(self, prompt: str, system_prompt: Optional[str], max_tokens: int,
+                 prompt_tokens: int, sources_used: List[int], passages_dropped: int):
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.prompt_tokens = prompt_tokens
+        self.sources_used = sources_used
+        self.passages_dropped = passages_dropped
+        self.history_turns = 0
+
+    def stats(self) -> Dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "max_tokens": self.max_tokens,
+            "sources": len(self.sources_used),
+            "passages_dropped": self.passages_dropped,
+            "history_turns": self.history_turns,
+        }
+
+
+def _history_block(summary: Optional[str], turns: Sequence[Tuple[str, str]], budget: int) -> Tuple[str, int]:
+    """
+    Render earlier conversation within `budget` tokens: the summary first,
+    then as many of the most recent turns as fit. Returns (text, turns kept).
+    """
+    header = "Conversation so far:\n"
+    remaining = budget - count_tokens(header) - 2
+    parts = []
+    if summary:
+        line = "Summary of earlier messages: " + summary
+        line = truncate_to_tokens(line, min(remaining, PROMPT_TURN_TOKENS * 2))
+        remaining -= count_tokens(line) + 1
+        if line:
+            parts.append(line)
+
+    kept = []
+    for role, content in reversed(turns):
+        line = f"{'User' if role == 'user' else 'Assistant'}: " + content
+        line = truncate_to_tokens(line, PROMPT_TURN_TOKENS)
+        cost = count_tokens(line) + 1
+        if cost > remaining:
+            break
+        kept.append(line)
+        remaining -= cost
+
+    parts.extend(reversed(kept))
+    if not parts:
+        return "", 0
+    return header + "\n".join(parts) + "\n\n", len(kept)
+
+
+def build_prompt(
+    question: str,
+    model: Optional[str] = None,
+    category: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    sources: Sequence[Tuple[str, str]] = (),
+    template: str = "{question}",
+    source_template: str = "{text}",
+    separator: str = "\n---\n",
+    max_input_tokens: int = PROMPT_MAX_INPUT_TOKENS,
+    summary: Optional[str] = None,
+    history: Sequence[Tuple[str, str]] = (),
+) -> BuiltPrompt:
+    """
+    Assemble a prompt from `template`, which may use {question} and {context}.
+
+    `sources` are (title, text) pairs in search-rank order; each chosen
+    source is rendered with `source_template` ({n}, {title}, {text}) and
+    joined with `separator`. The system prompt, template and question are
+    always kept. Earlier conversation (`summary` plus recent (role,
+    content) `history` turns, oldest first) comes next and is placed
+    before the template; source passages are then added best-first while
+    everything fits in min(max_input_tokens, context window - max_tokens).
+    """
+    max_tokens = max_tokens_for(category)
+    budget = min(max_input_tokens, context_window(model) - max_tokens)
+
+    fixed = count_tokens(system_prompt or "") + count_tokens(template.format(question="", context=""))
+    question = truncate_to_tokens(question, max(budget - fixed, 0))
+    remaining = budget - fixed - count_tokens(question)
+
+    preamble, turns_kept = "", 0
+    if summary or history:
+        preamble, turns_kept = _history_block(summary, history, remaining)
+        remaining -= count_tokens(preamble)
+
+    chosen: Dict[int, List[Tuple[int, str]]] = {}
+    ranked = rank_passages(question, sources) if sources else []
+    dropped = 0
+    for s, p, passage in ranked:
+        # Approximate each source's header cost when its first passage is taken
+        overhead = 1 if s in chosen else count_tokens(
+            source_template.format(n=s + 1, title=sources[s][0], text="") + separator
+        )
+        cost = count_tokens(passage) + overhead
+        if cost > remaining:
+            dropped += 1
+            continue
+        chosen.setdefault(s, []).append((p, passage))
+        remaining -= cost
+
+    blocks = []
+    for n, s in enumerate(sorted(chosen), 1):
+        text = " ".join(passage for _, passage in sorted(chosen[s]))
+        blocks.append(source_template.format(n=n, title=sources[s][0], text=text))
+
+    prompt = preamble + template.format(question=question, context=separator.join(blocks))
+    built = BuiltPrompt(
+        prompt=prompt,
+        system_prompt=system_prompt,
+        max_tokens=max_tokens,
+        prompt_tokens=count_tokens(prompt) + count_tokens(system_prompt or ""),
+        sources_used=sorted(chosen),
+        passages_dropped=dropped,
+    )
+    built.history_turns = turns_kept
+    return built
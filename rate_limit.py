@@ -0,0 +1,338 @@
+"""
+Rate Limiting
+Thread-safe token buckets that track Groq's request and token budgets
+and correct themselves from the x-ratelimit-* / Retry-After headers,
+plus a request governor that paces calls to a provider without a
+published budget (DuckDuckGo)
+"""
+
+import os
+import re
+import time
+import asyncio
+import threading
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows; the governor then paces this process only
+    fcntl = None
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations such as '7.66s', '2m59.56s' or '120ms' into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-size estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Classic token bucket; callers hold the owning limiter's lock"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if self.tokens >= amount:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return (min(amount, self.capacity) - self.tokens) / self.refill_per_second
+
+
+class _ModelBudget:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.blocked_until = 0.0
+
+
+class GroqRateLimiter:
+    """
+    Per-model request + token budgets.
+
+    acquire() waits up to `max_wait` seconds for both budgets instead of
+    failing straight away. Response headers (remaining requests/tokens,
+    reset times, token limit) and 429 Retry-After keep the local view
+    in line with what Groq actually enforces.
+    """
+
+    def __init__(self, requests_per_minute: float = 30, tokens_per_minute: float = 6000,
+                 max_wait: float = 5.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self._budgets: Dict[str, _ModelBudget] = {}
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.rejected = 0
+
+    def _budget(self, model: str) -> _ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = self._budgets[model] = _ModelBudget(
+                self.requests_per_minute, self.tokens_per_minute
+            )
+        return budget
+
+    def _reserve(self, model: str, tokens: int) -> float:
+        """Take one request + `tokens` if available, else return seconds to wait"""
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(model)
+            budget.requests.refill(now)
+            budget.tokens.refill(now)
+            wait = max(
+                budget.blocked_until - now,
+                budget.requests.wait_time(1),
+                budget.tokens.wait_time(tokens),
+            )
+            if wait <= 0:
+                budget.requests.tokens -= 1
+                budget.tokens.tokens -= min(tokens, budget.tokens.capacity)
+                return 0.0
+            return wait
+
+    def acquire(self, model: str, tokens: int = 0, max_wait: Optional[float] = None) -> bool:
+        """Blocking acquire for worker threads; False if the budget won't free up in time"""
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else max_wait)
+        waited = False
+        while True:
+            wait = self._reserve(model, tokens)
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+            if not waited:
+                self.throttled += 1
+                waited = True
+            time.sleep(wait)
+
+    async def acquire_async(self, model: str, tokens: int = 0, max_wait: Optional[float] = None) -> bool:
+        """Same as acquire() but yields to the event loop while waiting"""
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else max_wait)
+        waited = False
+        while True:
+            wait = self._reserve(model, tokens)
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+            if not waited:
+                self.throttled += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, model: str, headers: Mapping[str, str]) -> None:
+        """Sync the buckets with Groq's x-ratelimit-* response headers"""
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(model)
+
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            if limit_tokens and limit_tokens.isdigit():
+                budget.tokens.refill(now)
+                budget.tokens.capacity = float(limit_tokens)
+                budget.tokens.refill_per_second = float(limit_tokens) / 60
+
+            for bucket, kind in ((budget.requests, "requests"), (budget.tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                bucket.refill(now)
+                bucket.tokens = min(bucket.tokens, remaining)
+                if remaining <= 0:
+                    reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        budget.blocked_until = max(budget.blocked_until, now + reset)
+
+    def on_rate_limited(self, model: str, headers: Mapping[str, str]) -> None:
+        """Handle a 429: block the model until Retry-After (or the reported reset)"""
+        retry_after = parse_reset(headers.get("retry-after"))
+        if retry_after is None:
+            retry_after = max(
+                parse_reset(headers.get("x-ratelimit-reset-requests")) or 0,
+                parse_reset(headers.get("x-ratelimit-reset-tokens")) or 0,
+            ) or 1.0
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(model)
+            budget.blocked_until = max(budget.blocked_until, now + retry_after)
+            budget.requests.refill(now)
+            budget.requests.tokens = 0
+        self.update_from_headers(model, headers)
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        models = {}
+        with self._lock:
+            for model, budget in self._budgets.items():
+                budget.requests.refill(now)
+                budget.tokens.refill(now)
+                models[model] = {
+                    "requests_available": round(budget.requests.tokens, 2),
+                    "tokens_available": round(budget.tokens.tokens),
+                    "tokens_per_minute": budget.tokens.capacity,
+                    "blocked_for": round(max(budget.blocked_until - now, 0), 2),
+                }
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "max_wait": self.max_wait,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "models": models,
+        }
+
+
+class RequestGovernor:
+    """
+    Spaces outbound calls to one provider at least `min_interval` apart.
+
+    Each caller reserves the next free slot (first come, first served)
+    and waits only until its own slot, so concurrent requests queue
+    behind each other instead of each one pacing itself. With
+    `state_path` the schedule lives in a flock'ed file and is shared by
+    every process on the host. penalize() pushes the schedule back after
+    the provider reports rate limiting.
+    """
+
+    def __init__(self, min_interval: float, max_wait: float = 10.0,
+                 state_path: Optional[str] = None):
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self.state_path = state_path if fcntl is not None else None
+        # Wall-clock time when shared through a file, so processes agree on it
+        self._clock = time.time if self.state_path else time.monotonic
+        self._next_free = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.penalties = 0
+        self.total_wait = 0.0
+        self.max_waited = 0.0
+        self.state_errors = 0
+
+    def _update(self, change: Callable[[float, float], Tuple[float, float, float]]) -> float:
+        """Apply change(next_free, blocked_until) -> (result, next_free, blocked_until) atomically"""
+        with self._lock:
+            if self.state_path:
+                try:
+                    return self._update_shared(change)
+                except (OSError, ValueError):
+                    # Fall back to pacing this process alone
+                    self.state_errors += 1
+            result, self._next_free, self._blocked_until = change(self._next_free, self._blocked_until)
+            return result
+
+    def _update_shared(self, change) -> float:
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.state_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            fields = f.read().split()
+            next_free, blocked_until = (float(fields[0]), float(fields[1])) if len(fields) == 2 else (0.0, 0.0)
+            result, next_free, blocked_until = change(next_free, blocked_until)
+            self._blocked_until = blocked_until  # last seen, for status()
+            f.seek(0)
+            f.truncate()
+            f.write(f"{next_free:.6f} {blocked_until:.6f}")
+            return result
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Take the next free slot without waiting for it; returns the
+        seconds until it is due, or None (without taking a slot) if that
+        would exceed `max_wait`.
+        """
+        limit = self.max_wait if max_wait is None else max_wait
+        now = self._clock()
+
+        def reserve(next_free, blocked_until):
+            slot = max(now, next_free, blocked_until)
+            if slot - now > limit:
+                return -1.0, next_free, blocked_until
+            return slot - now, slot + self.min_interval, blocked_until
+
+        wait = self._update(reserve)
+        if wait < 0:
+            self.rejected += 1
+            return None
+
+        self.calls += 1
+        if wait > 0:
+            self.delayed += 1
+            self.total_wait += wait
+            self.max_waited = max(self.max_waited, wait)
+        return wait
+
+    def acquire(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Blocking reserve() for worker threads: sleeps until the slot is due"""
+        wait = self.reserve(max_wait)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Same as acquire() but yields to the event loop while waiting"""
+        wait = self.reserve(max_wait)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        """Hold every caller back for `seconds` (e.g. after a rate-limit error)"""
+        until = self._clock() + seconds
+        self.penalties += 1
+        self._update(lambda next_free, blocked_until: (0.0, next_free, max(blocked_until, until)))
+
+    def status(self) -> Dict:
+        now = self._clock()
+        return {
+            "min_interval": self.min_interval,
+            "max_wait": self.max_wait,
+            "shared": bool(self.state_path),
+            "calls": self.calls,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+            "penalties": self.penalties,
+            "avg_wait": round(self.total_wait / self.calls, 3) if self.calls else 0.0,
+            "max_wait_seen": round(self.max_waited, 3),
+            "blocked_for": round(max(self._blocked_until - now, 0), 2),
+            "state_errors": self.state_errors,
+        }
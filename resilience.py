@@ -0,0 +1,112 @@
+"""
+Resilience
+Jittered exponential backoff and per-key circuit breakers for upstream calls
+"""
+
+import random
+import time
+import threading
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int, base: float = 0.25, cap: float = 4.0) -> float:
+    """Full-jitter backoff: uniform(0, min(cap, base * 2**attempt)) for attempt 0, 1, 2..."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    `failure_threshold` failures in a row open the circuit and allow()
+    turns everything away for `reset_timeout` seconds. After that the
+    circuit is half-open: one probe is let through, and its result either
+    closes the circuit or re-opens it for another `reset_timeout`. A probe
+    that never reports back (e.g. cancelled) is replaced after the same
+    timeout, so the breaker cannot get stuck half-open.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """May a call go out now? Claims the probe slot when half-open."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_at = now
+                return True
+            if self._state == HALF_OPEN and now - self._probe_at >= self.reset_timeout:
+                self._probe_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+    def status(self) -> Dict:
+        state = self.state
+        return {
+            "state": state,
+            "failures": self._failures,
+            "open_for": round(max(self._opened_at + self.reset_timeout - time.monotonic(), 0), 1)
+            if state == OPEN else 0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreakers:
+    """One lazily created CircuitBreaker per key (e.g. per model)"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    key, CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+        return breaker
+
+    def status(self) -> Dict:
+        return {key: breaker.status() for key, breaker in list(self._breakers.items())}
@@ -0,0 +1,137 @@
+"""
+SSE Parser
+Incremental byte-level decoder for Groq's text/event-stream responses.
+Frames may be split anywhere across network chunks; only the token text
+(choices[0].delta.content) is pulled out of each chat.completion.chunk.
+"""
+
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional
+
+# Fastest available JSON decoder: orjson, then jiter (ships with the openai SDK), then stdlib
+try:
+    import orjson
+    loads = orjson.loads
+    JSON_DECODER = "orjson"
+except ImportError:
+    try:
+        import jiter
+        loads = jiter.from_json
+        JSON_DECODER = "jiter"
+    except ImportError:
+        loads = json.loads
+        JSON_DECODER = "json"
+
+DONE = b"[DONE]"
+_CONTENT_KEY = b'"delta":{"content":"'
+
+
+class SSEDecoder:
+    """
+    Feed raw bytes, get back the `data` payload of every completed event.
+
+    Events are cut at blank lines (LF or CRLF line endings); multi-line
+    data fields are joined with LF as the SSE spec requires. Comments and
+    non-data fields (event, id, retry) are ignored since Groq does not
+    use them. The common Groq frame, a single `data: ...` line, is
+    handled without splitting it into lines at all.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        buffer = self._buffer + chunk if self._buffer else chunk
+        if b"\r" in buffer:
+            buffer = buffer.replace(b"\r\n", b"\n")
+        if b"\n\n" not in buffer:
+            self._buffer = buffer
+            return []
+
+        events = buffer.split(b"\n\n")
+        self._buffer = events.pop()
+        payloads = []
+        for event in events:
+            if event.startswith(b"data: ") and b"\n" not in event:
+                payloads.append(event[6:])
+            elif event:
+                data = _event_data(event)
+                if data is not None:
+                    payloads.append(data)
+        return payloads
+
+    def flush(self) -> List[bytes]:
+        """Dispatch whatever is left once the stream has ended"""
+        events = self.feed(b"\n\n") if self._buffer else []
+        self._buffer = b""
+        return events
+
+
+def _event_data(event: bytes) -> Optional[bytes]:
+    """General path: collect the data lines of one event"""
+    lines = []
+    for line in event.split(b"\n"):
+        if line.startswith(b"data:"):
+            value = line[5:]
+            lines.append(value[1:] if value.startswith(b" ") else value)
+    return b"\n".join(lines) if lines else None
+
+
+def delta_content(data: bytes) -> Optional[str]:
+    """Token text of one chat.completion.chunk payload, or None"""
+    # Fast path: Groq writes the delta as {"content":"..."}. When that string
+    # has no escapes its raw bytes are the token, so no JSON parse is needed.
+    # (The key can't match inside another string value: quotes there are escaped.)
+    start = data.find(_CONTENT_KEY)
+    if start >= 0:
+        start += len(_CONTENT_KEY)
+        end = data.find(b'"', start)
+        if end > 0 and data.find(b"\\", start, end) < 0 and data[end + 1:end + 2] in (b"}", b","):
+            return data[start:end].decode("utf-8") or None
+
+    # Role-only and usage-only frames carry no content key at all
+    if b'"content"' not in data:
+        return None
+    try:
+        choices = loads(data).get("choices")
+        if choices:
+            return (choices[0].get("delta") or {}).get("content") or None
+    except (ValueError, AttributeError, TypeError):
+        pass
+    return None
+
+
+def iter_content(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Token texts from raw response bytes, stopping at [DONE]"""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if data == DONE:
+                return
+            token = delta_content(data)
+            if token:
+                yield token
+    for data in decoder.flush():
+        if data == DONE:
+            return
+        token = delta_content(data)
+        if token:
+            yield token
+
+
+async def aiter_content(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Async twin of iter_content"""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if data == DONE:
+                return
+            token = delta_content(data)
+            if token:
+                yield token
+    for data in decoder.flush():
+        if data == DONE:
+            return
+        token = delta_content(data)
+        if token:
+            yield token
@@ -0,0 +1,304 @@
+"""
+SSE Streaming Helpers
+Frame building, token coalescing, per-stream throughput stats,
+single-flight fan-out and client-disconnect handling for the /ask endpoint
+"""
+
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, AsyncGenerator, Callable, Dict, Hashable, Optional, Tuple
+
+import metrics
+
+# =========================
+# CONFIGURATION
+# =========================
+
+# Tokens are held back for at most this long before a frame is emitted
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "30"))
+# ...or until this many bytes are buffered, whichever comes first
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "512"))
+# How often an open stream checks whether its client is still there
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+SSE_STREAMS = metrics.counter("sse_streams_total", "Finished /ask streams by outcome", ("outcome",))
+SSE_FRAMES = metrics.counter("sse_frames_total", "SSE frames written")
+SSE_BYTES = metrics.counter("sse_bytes_total", "SSE bytes written")
+SSE_FRAMES_PER_SECOND = metrics.histogram("sse_frames_per_second", "Per-stream SSE frame rate")
+SSE_BYTES_PER_SECOND = metrics.histogram("sse_bytes_per_second", "Per-stream SSE byte rate")
+
+# =========================
+# FRAMING
+# =========================
+
+def sse_event(event_type: str, text: Optional[str] = None, **fields) -> str:
+    """Build one SSE `data:` frame"""
+    payload = {"type": event_type}
+    if text is not None:
+        payload["text"] = text
+    payload.update(fields)
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class StreamStats:
+    """Counts frames and bytes written to one SSE stream"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.frames = 0
+        self.bytes = 0
+
+    def record(self, frame: str) -> str:
+        self.frames += 1
+        self.bytes += len(frame)
+        return frame
+
+    def summary(self) -> Dict:
+        elapsed = max(time.perf_counter() - self.started, 1e-6)
+        return {
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "seconds": round(elapsed, 3),
+            "frames_per_s": round(self.frames / elapsed, 1),
+            "bytes_per_s": round(self.bytes / elapsed, 1),
+        }
+
+    def publish(self, outcome: str) -> Dict:
+        """Fold this stream into the process-wide metrics and return its summary"""
+        summary = self.summary()
+        SSE_STREAMS.inc(outcome=outcome)
+        SSE_FRAMES.inc(self.frames)
+        SSE_BYTES.inc(self.bytes)
+        SSE_FRAMES_PER_SECOND.observe(summary["frames_per_s"])
+        SSE_BYTES_PER_SECOND.observe(summary["bytes_per_s"])
+        return summary
+
+# =========================
+# TOKEN COALESCING
+# =========================
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    window_ms: float = SSE_COALESCE_MS,
+    max_bytes: int = SSE_COALESCE_BYTES,
+) -> AsyncGenerator[str, None]:
+    """
+    Merge a token stream into larger chunks.
+
+    A chunk is flushed once `window_ms` has passed since its first token
+    or once it reaches `max_bytes`. The upstream iterator is drained by a
+    separate task so a quiet upstream never delays a due flush.
+    window_ms <= 0 disables coalescing.
+    """
+    if window_ms <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    pending = deque()
+    ready = asyncio.Event()
+    state = {"finished": False, "error": None}
+
+    async def pump():
+        try:
+            async for token in tokens:
+                pending.append(token)
+                ready.set()
+        except Exception as e:
+            state["error"] = e
+        finally:
+            state["finished"] = True
+            ready.set()
+
+    task = asyncio.create_task(pump())
+    buf, size, flush_at = [], 0, 0.0
+
+    try:
+        while True:
+            if not pending and not state["finished"]:
+                ready.clear()
+                timeout = max(flush_at - loop.time(), 0) if buf else None
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            while pending and size < max_bytes:
+                token = pending.popleft()
+                if not buf:
+                    flush_at = loop.time() + window
+                buf.append(token)
+                size += len(token.encode())
+
+            drained = state["finished"] and not pending
+            if buf and (drained or size >= max_bytes or loop.time() >= flush_at):
+                yield "".join(buf)
+                buf, size = [], 0
+
+            if drained:
+                break
+
+        if state["error"] is not None:
+            raise state["error"]
+    finally:
+        task.cancel()
+
+# =========================
+# SINGLE-FLIGHT FAN-OUT
+# =========================
+
+_END = object()
+
+
+class Flight:
+    """
+    One upstream event pipeline shared by any number of subscribers.
+
+    The pipeline runs in its own task. Every event is kept so a
+    subscriber that joins late replays what it missed before following
+    live output. When the last subscriber leaves early, the flight is
+    closed to new joiners and its task cancelled, which closes the
+    upstream Groq request and any page fetches still in progress.
+    Anyone still subscribed at cancellation gets an error event.
+    """
+
+    def __init__(self, source: AsyncIterator[Tuple[str, Optional[str]]], on_finish: Optional[Callable] = None):
+        self.events = []
+        self.done = False
+        self.closed = False
+        self._subscribers = set()
+        self._on_finish = on_finish
+        self._task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source):
+        try:
+            async for event in source:
+                self._publish(event)
+        except asyncio.CancelledError:
+            if self._subscribers:
+                self._publish(("error", "The answer was cancelled. Please try again."))
+            raise
+        except Exception as e:
+            self._publish(("error", str(e)))
+        finally:
+            self.done = True
+            for q in self._subscribers:
+                q.put_nowait(_END)
+            if self._on_finish:
+                self._on_finish(self)
+
+    def _publish(self, event):
+        self.events.append(event)
+        for q in self._subscribers:
+            q.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        q = asyncio.Queue()
+        for event in self.events:
+            q.put_nowait(event)
+        if self.done:
+            q.put_nowait(_END)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        """Drop a subscriber; the pipeline is cancelled once nobody is listening"""
+        self._subscribers.discard(q)
+        if not self._subscribers and not self.done and not self.closed:
+            # Closed now rather than when the task next runs, so join()
+            # never hands the dying flight to a new request
+            self.closed = True
+            self._task.cancel()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    async def stream(self) -> AsyncGenerator[Tuple[str, Optional[str]], None]:
+        q = self.subscribe()
+        try:
+            while True:
+                event = await q.get()
+                if event is _END:
+                    return
+                yield event
+        finally:
+            self.unsubscribe(q)
+
+
+class SingleFlight:
+    """Merge identical in-flight pipelines: the first caller runs it, the rest follow"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self.merged = 0
+
+    def join(self, key: Hashable, factory: Callable[[], AsyncIterator]) -> Tuple[Flight, bool]:
+        """Return (flight, is_leader) for `key`, starting `factory()` if nothing is running"""
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done and not flight.closed:
+            self.merged += 1
+            return flight, False
+
+        flight = Flight(factory(), on_finish=lambda f: self._forget(key, f))
+        self._flights[key] = flight
+        return flight, True
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+# =========================
+# CLIENT DISCONNECT
+# =========================
+
+class ClientDisconnected(Exception):
+    """Raised into the SSE generator when the client has gone away"""
+
+
+async def _wait_for_disconnect(request, interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def cancel_on_disconnect(
+    events: AsyncIterator,
+    request,
+    interval: float = DISCONNECT_POLL_INTERVAL,
+) -> AsyncGenerator:
+    """
+    Relay `events` while the client is connected.
+
+    The pending read is raced against a disconnect watcher; if the
+    client leaves first the read is cancelled (unwinding the upstream
+    iterator) and ClientDisconnected is raised.
+    """
+    watcher = asyncio.create_task(_wait_for_disconnect(request, interval))
+    iterator = events.__aiter__()
+    step = None
+
+    try:
+        while True:
+            step = asyncio.ensure_future(iterator.__anext__())
+            await asyncio.wait({step, watcher}, return_when=asyncio.FIRST_COMPLETED)
+
+            if not step.done():
+                raise ClientDisconnected()
+
+            try:
+                event = step.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        watcher.cancel()
+        if step is not None and not step.done():
+            step.cancel()
@@ -0,0 +1,30 @@
+"""
+Test that /ask gives its admission slot back when it fails before streaming
+"""
+import sys
+sys.path.insert(0, '.')
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+
+def test_failed_ask_releases_admission_slot(monkeypatch):
+    def broken_queue(*args, **kwargs):
+        raise RuntimeError("persistence unavailable")
+
+    monkeypatch.setattr(app_module, "queue_message", broken_queue)
+    monkeypatch.setattr(app_module.memory, "load", lambda chat_id, user_id: None)
+    client = TestClient(app_module.app)
+    active = app_module.admission.active
+
+    for _ in range(app_module.admission.max_concurrent + 1):
+        response = client.post("/ask", json={"message": "hello there", "chat_id": "admission-test"})
+        assert response.status_code == 500
+
+    assert app_module.admission.active == active
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,68 @@
+"""
+Test that only complete browsing answers reach the answer cache
+"""
+import sys
+sys.path.insert(0, '.')
+
+import asyncio
+
+import pytest
+
+import app as app_module
+from groq_client import StreamInterrupted
+
+
+QUESTION = "how does tcp slow start work"
+
+
+@pytest.fixture
+def browsing(monkeypatch):
+    """Stub search and page fetches so _answer_events goes straight to the model"""
+    async def search(query, max_results=3):
+        return [{"title": "TCP", "url": "https://example.com/tcp"}]
+
+    async def fetch(urls, want=None):
+        return [(urls[0], "Slow start doubles the congestion window every round trip.")]
+
+    monkeypatch.setattr(app_module, "search_web_async", search)
+    monkeypatch.setattr(app_module, "fetch_pages_async", fetch)
+    app_module.answer_cache.clear()
+    yield
+    app_module.answer_cache.clear()
+
+
+def _run(cache_key):
+    async def collect():
+        return [event async for event in app_module._answer_events(QUESTION, cache_key)]
+    return asyncio.run(collect())
+
+
+def test_interrupted_stream_is_not_cached(browsing, monkeypatch):
+    async def failing_stream(prompt, model=None, max_tokens=None, **kwargs):
+        yield "Partial answer"
+        raise StreamInterrupted(model or "test-model", ConnectionError("reset"))
+
+    monkeypatch.setattr(app_module, "groq_response_streaming_async", failing_stream)
+    cache_key = app_module.normalize_query(QUESTION)
+    events = _run(cache_key)
+
+    kinds = [kind for kind, _ in events]
+    assert ("text", "Partial answer") in events
+    assert "error" in kinds
+    assert app_module.answer_cache.get(cache_key) is None
+
+
+def test_complete_stream_is_cached(browsing, monkeypatch):
+    async def stream(prompt, model=None, max_tokens=None, **kwargs):
+        yield "Full answer."
+
+    monkeypatch.setattr(app_module, "groq_response_streaming_async", stream)
+    cache_key = app_module.normalize_query(QUESTION)
+    events = _run(cache_key)
+
+    assert "error" not in [kind for kind, _ in events]
+    assert "".join(app_module.answer_cache.get(cache_key)) == "Full answer."
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
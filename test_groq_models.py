@@ -5,10 +5,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 API_KEY = os.getenv('GROQ_API_KEY')
+API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1').rstrip('/')
 headers = {'Authorization': f'Bearer {API_KEY}'}
 
 print('Fetching available models from Groq...')
-r = requests.get('https://api.groq.com/openai/v1/models', headers=headers, timeout=10)
+r = requests.get(f'{API_URL}/models', headers=headers, timeout=10)
 if r.status_code == 200:
     models = r.json()
     print('Available models:')
@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
-"""Test Groq response times to verify performance improvement"""
+"""
+Test Groq response times to verify performance improvement.
+
+For reproducible numbers without an API key, start mock_groq_server.py and run:
+    GROQ_API_URL=http://127.0.0.1:8090/openai/v1 GROQ_API_KEY=mock python test_groq_performance.py
+"""
 
 import time
 import os
@@ -9,9 +14,10 @@ import logging
 logging.getLogger('flask').setLevel(logging.ERROR)
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
-from groq_client import groq_response
+from groq_client import groq_response, groq_batch
 
-def test_groq_performance():
+def run_sequential_tests():
+    """Time each prompt one after another; returns (tests, successful times)"""
     print('=' * 70)
     print('GROQ RESPONSE TIME TEST')
     print('=' * 70)
@@ -95,5 +101,35 @@ def test_groq_performance():
     else:
         print('✗ All requests failed. Check GROQ_API_KEY configuration.')
 
+    return tests, valid_times
+
+def test_groq_performance():
+    run_sequential_tests()
+
+def run_batch_comparison(tests, sequential_times, concurrency=4):
+    print('\n' + '=' * 70)
+    print(f'GROQ BATCH TEST (concurrency={concurrency})')
+    print('=' * 70)
+
+    jobs = [
+        {'id': test['name'], 'prompt': test['query'], 'system_prompt': test['system_prompt']}
+        for test in tests
+    ]
+
+    start = time.time()
+    results = list(groq_batch(jobs, concurrency=concurrency))
+    elapsed = time.time() - start
+
+    for result in results:
+        status = '✓' if result['response'] is not None else '✗'
+        print(f'{status} {result["id"]}: {result["seconds"]:.2f}s')
+
+    ok = sum(1 for r in results if r['response'] is not None)
+    print(f'\nSuccessful requests: {ok}/{len(jobs)}')
+    print(f'Batch wall time: {elapsed:.2f} seconds')
+    if sequential_times:
+        print(f'Sequential total: {sum(sequential_times):.2f} seconds')
+
 if __name__ == '__main__':
-    test_groq_performance()
+    tests, times = run_sequential_tests()
+    run_batch_comparison(tests, times)
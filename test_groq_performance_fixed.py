@@ -7,6 +7,8 @@ load_dotenv()
 
 API_KEY = os.getenv('GROQ_API_KEY')
 MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
+# Set to http://127.0.0.1:8090/openai/v1 to run against mock_groq_server.py
+API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1').rstrip('/')
 headers = {
     'Authorization': f'Bearer {API_KEY}',
     'Content-Type': 'application/json'
@@ -18,7 +20,7 @@ test_prompts = [
     "Write a haiku about programming",
 ]
 
-print(f"Testing Groq API with model: {MODEL}\n")
+print(f"Testing Groq API at {API_URL} with model: {MODEL}\n")
 
 total_time = 0
 success_count = 0
@@ -32,7 +34,7 @@ for i, prompt in enumerate(test_prompts, 1):
     }
     
     start = time.time()
-    r = requests.post('https://api.groq.com/openai/v1/chat/completions', json=payload, headers=headers, timeout=10)
+    r = requests.post(f'{API_URL}/chat/completions', json=payload, headers=headers, timeout=10)
     elapsed = time.time() - start
     
     print(f"Test {i}: {prompt}")
@@ -0,0 +1,90 @@
+"""
+Test the write-behind persistence queue, and the conversation memory
+built on it, against a throwaway SQLite database
+"""
+import sys
+sys.path.insert(0, '.')
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models  # noqa: F401  (registers the tables on database.Base)
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point every database helper at a fresh SQLite file"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'chats.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    database.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(
+        database, "SessionLocal",
+        sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    )
+    return engine
+
+
+def test_queued_message_is_written(temp_db):
+    """A queued message must be readable after flush, with the writer still alive"""
+    queue = database.PersistenceQueue(flush_interval=0.01)
+    written = []
+    queue.add_listener(written.append)
+    try:
+        queue.enqueue("persist-test", None, "user", "hello")
+        queue.enqueue("persist-test", None, "assistant", "hi there")
+        queue.flush()
+
+        assert queue._thread.is_alive()
+        assert database.get_chat_history("persist-test", None) == [
+            ["user", "hello"],
+            ["assistant", "hi there"],
+        ]
+        assert written and all(written)
+    finally:
+        queue.stop()
+
+
+def test_ask_turns_feed_conversation_memory(temp_db, monkeypatch):
+    """/ask turns go through the real queue and come back as context and summary"""
+    from fastapi.testclient import TestClient
+    import app as app_module
+    import conversation
+
+    async def answer(prompt, model=None, max_tokens=None, **kwargs):
+        yield "noted"
+
+    def summarize(summary, messages):
+        asked = " ".join(content for role, content in messages if role == "user")
+        return f"{summary} {asked}".strip() if summary else asked
+
+    monkeypatch.setattr(app_module, "groq_response_streaming_async", answer)
+    monkeypatch.setattr(conversation, "summarize", summarize)
+
+    client = TestClient(app_module.app)
+    questions = [f"q{i}" for i in range(6)]  # short inputs take the conversational path
+    for question in questions:
+        response = client.post("/ask", json={"message": question, "chat_id": "memory-test"})
+        assert response.status_code == 200
+        assert "noted" in response.text
+
+    app_module.persistence_queue.flush()
+    # Summaries are folded on the memory's single worker; wait for it to go idle
+    for _ in range(3):
+        conversation.memory._executor.submit(lambda: None).result()
+
+    context = conversation.memory.load("memory-test", 0)
+    recent = conversation.memory.recent_messages
+    assert context.turns[-2:] == [("user", "q5"), ("assistant", "noted")]
+    assert 0 < len(context.turns) <= recent
+    # The oldest turns have been folded into the rolling summary
+    assert context.summary and "q0" in context.summary
+    assert ("user", "q0") not in context.turns
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
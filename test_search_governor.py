@@ -0,0 +1,49 @@
+"""
+Test that queued searches wait on the event loop, not in worker threads
+"""
+import sys
+sys.path.insert(0, '.')
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rate_limit import RequestGovernor
+
+
+def test_async_waits_leave_threads_free():
+    """Queued acquire_async calls must not delay unrelated to_thread work"""
+    governor = RequestGovernor(min_interval=0.2, max_wait=5.0)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        # A small pool makes any thread held by a waiting search show up at once
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=2))
+        searches = [asyncio.create_task(governor.acquire_async()) for _ in range(8)]
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        await asyncio.to_thread(lambda: None)
+        unrelated = time.monotonic() - start
+        waits = await asyncio.gather(*searches)
+        return unrelated, waits
+
+    unrelated, waits = asyncio.run(scenario())
+    assert unrelated < 0.1
+    assert sorted(waits) == waits and waits[0] == 0.0
+    assert waits[-1] == pytest.approx(1.4, abs=0.05)
+
+
+def test_reserve_rejects_without_taking_a_slot():
+    governor = RequestGovernor(min_interval=1.0, max_wait=1.5)
+    assert governor.reserve() == 0.0
+    assert governor.reserve() == pytest.approx(1.0, abs=0.05)
+    assert governor.reserve() is None
+    assert governor.status()["rejected"] == 1
+    # A rejected caller left the schedule as it was
+    assert governor.reserve(max_wait=3.0) == pytest.approx(2.0, abs=0.05)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,58 @@
+"""
+Test that a cancelled single-flight pipeline is never handed to new requests
+"""
+import sys
+sys.path.insert(0, '.')
+
+import asyncio
+
+import pytest
+
+from streaming import SingleFlight
+
+
+def _pipeline(label):
+    async def source():
+        yield ('text', f'{label} part1 ')
+        await asyncio.sleep(0.05)
+        yield ('text', f'{label} part2')
+    return source
+
+
+async def _collect(flight):
+    return [event async for event in flight.stream()]
+
+
+def test_join_after_last_subscriber_leaves_starts_new_flight():
+    async def scenario():
+        inflight = SingleFlight()
+        first, _ = inflight.join('q', _pipeline('old'))
+        queue = first.subscribe()
+        await queue.get()
+        # Last subscriber leaves: the task is cancelled but has not run yet
+        first.unsubscribe(queue)
+
+        second, leader = inflight.join('q', _pipeline('new'))
+        return first, second, leader, await _collect(second)
+
+    first, second, leader, events = asyncio.run(scenario())
+    assert second is not first and leader
+    assert events == [('text', 'new part1 '), ('text', 'new part2')]
+
+
+def test_cancelled_flight_reports_error_to_remaining_subscribers():
+    async def scenario():
+        inflight = SingleFlight()
+        flight, _ = inflight.join('q', _pipeline('old'))
+        follower = asyncio.create_task(_collect(flight))
+        await asyncio.sleep(0.01)
+        flight._task.cancel()
+        return await follower
+
+    events = asyncio.run(scenario())
+    assert events[0] == ('text', 'old part1 ')
+    assert events[-1][0] == 'error'
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
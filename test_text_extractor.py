@@ -0,0 +1,35 @@
+"""
+Test the text extractor engine selection
+"""
+import sys
+sys.path.insert(0, '.')
+
+import pytest
+
+import text_extractor
+
+
+@pytest.mark.parametrize("setting", ["lmxl", "bs4"])
+def test_bad_engine_setting_falls_back(monkeypatch, capsys, setting):
+    monkeypatch.setattr(text_extractor, "TEXT_EXTRACTOR", setting)
+    if setting == "bs4":
+        # Installed or not, pretend it is missing
+        def missing(html, limit):
+            raise ImportError("No module named 'bs4'")
+        monkeypatch.setitem(text_extractor.EXTRACTORS, "bs4", missing)
+
+    engine = text_extractor._default_engine()
+
+    assert engine in ("lxml", "stdlib")
+    assert "Falling back" in capsys.readouterr().out
+    html = "<html><body><nav>menu</nav><p>Hello <b>world</b></p></body></html>"
+    assert text_extractor.extract_text(html, 100, engine=engine) == "Hello world"
+
+
+def test_valid_engine_setting_is_kept(monkeypatch):
+    monkeypatch.setattr(text_extractor, "TEXT_EXTRACTOR", "stdlib")
+    assert text_extractor._default_engine() == "stdlib"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,262 @@
+"""
+Text Extractor
+Pluggable engines that turn fetched HTML into capped readable text.
+Every engine drops the same non-content elements and joins the
+remaining text nodes with spaces. The streaming engines (lxml and the
+stdlib tokenizer) feed the document in slices and stop as soon as
+enough text has been collected, instead of building a full tree for
+text that would be thrown away. Also sniffs and decodes the (capped)
+raw bytes of a download.
+"""
+
+import os
+import re
+import codecs
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+
+# =========================
+# CONFIGURATION
+# =========================
+
+# "auto" picks lxml when installed, else the stdlib tokenizer
+TEXT_EXTRACTOR = os.getenv("TEXT_EXTRACTOR", "auto")
+# Characters fed to a streaming parser between early-stop checks
+FEED_CHARS = 16384
+
+# Content types worth extracting; a missing or generic type is sniffed instead
+TEXT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+SNIFF_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+
+_BINARY_MAGIC = (
+    b"%PDF-", b"PK\x03\x04", b"\x89PNG", b"GIF8", b"\xff\xd8\xff",
+    b"\x1f\x8b", b"RIFF", b"\x00\x00\x01\x00", b"OggS", b"ID3",
+)
+_CHARSET_PARAM = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+# Labels browsers treat as windows-1252 (WHATWG encoding standard)
+_LATIN1_LABELS = {"iso-8859-1", "iso8859-1", "latin1", "latin-1", "us-ascii", "ascii"}
+
+SKIP_TAGS = frozenset((
+    "script",
+    "style",
+    "nav",
+    "footer",
+    "header",
+    "noscript",
+    "aside",
+    "form",
+))
+
+
+class _TextCollector:
+    """
+    Parser target shared by the streaming engines.
+
+    Text arriving in several pieces for one node is buffered until the
+    next tag so it is stripped as a whole, matching BeautifulSoup's
+    stripped_strings.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts: List[str] = []
+        self.length = 0
+        self.skip_depth = 0
+        self._pending: List[str] = []
+
+    @property
+    def full(self) -> bool:
+        return self.length >= self.limit
+
+    def _flush(self) -> None:
+        if self._pending:
+            text = "".join(self._pending).strip()
+            self._pending = []
+            if text:
+                self.length += len(text) + (1 if self.parts else 0)
+                self.parts.append(text)
+
+    def start(self, tag, attrib=None) -> None:
+        self._flush()
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag) -> None:
+        self._flush()
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, text: str) -> None:
+        if not self.skip_depth:
+            self._pending.append(text)
+
+    def close(self) -> str:
+        self._flush()
+        return " ".join(self.parts)[:self.limit]
+
+
+def _feed_until_full(parser, collector: _TextCollector, html: str) -> None:
+    for i in range(0, len(html), FEED_CHARS):
+        parser.feed(html[i:i + FEED_CHARS])
+        if collector.full:
+            return
+
+
+# =========================
+# ENGINES
+# =========================
+
+def extract_lxml(html: str, limit: int) -> str:
+    """lxml's libxml2 HTML parser driving a target; no tree is built"""
+    from lxml import etree
+
+    collector = _TextCollector(limit)
+    parser = etree.HTMLParser(target=collector, remove_comments=True, remove_pis=True)
+    _feed_until_full(parser, collector, html)
+    if collector.full:
+        return collector.close()
+    try:
+        return parser.close()
+    except etree.LxmlError:
+        return collector.close()
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector: _TextCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags have no content to skip
+        self.collector._flush()
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def extract_stdlib(html: str, limit: int) -> str:
+    """Pure-Python streaming tokenizer (html.parser without a tree)"""
+    collector = _TextCollector(limit)
+    parser = _StdlibParser(collector)
+    _feed_until_full(parser, collector, html)
+    if not collector.full:
+        parser.close()
+    return collector.close()
+
+
+def extract_bs4(html: str, limit: int) -> str:
+    """Original full-tree BeautifulSoup path, kept as a reference engine"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    return " ".join(soup.stripped_strings)[:limit]
+
+
+EXTRACTORS: Dict[str, Callable[[str, int], str]] = {
+    "lxml": extract_lxml,
+    "stdlib": extract_stdlib,
+    "bs4": extract_bs4,
+}
+
+
+def register_extractor(name: str, extractor: Callable[[str, int], str]) -> None:
+    """Add an engine: extractor(html, limit) -> text of at most `limit` characters"""
+    EXTRACTORS[name] = extractor
+
+
+def _usable(name: str) -> bool:
+    """Known engine whose parser is installed"""
+    try:
+        EXTRACTORS[name]("<p>probe</p>", 10)
+        return True
+    except (KeyError, ImportError):
+        return False
+
+
+def _default_engine() -> str:
+    """Checked once at import: a bad setting would otherwise empty every page"""
+    if TEXT_EXTRACTOR != "auto":
+        if _usable(TEXT_EXTRACTOR):
+            return TEXT_EXTRACTOR
+        print(f"[EXTRACT] TEXT_EXTRACTOR={TEXT_EXTRACTOR!r} is unknown or not installed; "
+              f"choose from {sorted(EXTRACTORS)}. Falling back to auto")
+    return "lxml" if _usable("lxml") else "stdlib"
+
+
+DEFAULT_EXTRACTOR = _default_engine()
+
+
+def extract_text(html: str, limit: int, engine: str = None) -> str:
+    """Readable text of `html`, at most `limit` characters"""
+    return EXTRACTORS[engine or DEFAULT_EXTRACTOR](html, limit)
+
+
+# =========================
+# RAW BYTES
+# =========================
+
+def media_type(content_type: Optional[str]) -> str:
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def is_text_type(content_type: Optional[str]) -> Optional[bool]:
+    """True/False from the Content-Type header alone, None if the body must be sniffed"""
+    kind = media_type(content_type)
+    if kind in SNIFF_TYPES:
+        return None
+    return kind in TEXT_TYPES
+
+
+def looks_binary(prefix: bytes) -> bool:
+    """Known binary signatures, or NUL bytes in the first KB (never in text HTML)"""
+    if prefix.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return False
+    return prefix.startswith(_BINARY_MAGIC) or b"\x00" in prefix[:1024]
+
+
+def detect_charset(body: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """Declared encoding: BOM, then Content-Type charset, then <meta> in the first 2KB"""
+    if body.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if body.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    match = _CHARSET_PARAM.search(content_type or "")
+    label = match.group(1) if match else None
+    if label is None:
+        meta = _META_CHARSET.search(body[:2048])
+        label = meta.group(1).decode("ascii", "ignore") if meta else None
+    if not label:
+        return None
+
+    label = label.lower()
+    if label in _LATIN1_LABELS:
+        return "cp1252"
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+def decode_html(body: bytes, content_type: Optional[str] = None) -> str:
+    """
+    Decode a possibly truncated body. Undeclared encodings are tried as
+    UTF-8 and fall back to windows-1252; a character cut off by the byte
+    cap is dropped rather than replaced.
+    """
+    encoding = detect_charset(body, content_type)
+    if encoding is None:
+        try:
+            return codecs.getincrementaldecoder("utf-8")().decode(body, final=False)
+        except UnicodeDecodeError:
+            encoding = "cp1252"
+    return codecs.getincrementaldecoder(encoding)(errors="replace").decode(body, final=False)
@@ -1,8 +1,22 @@
+import os
 import time
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeout
 from ddgs import DDGS
 
+try:
+    from ddgs.exceptions import RatelimitException
+except ImportError:
+    class RatelimitException(Exception):
+        """Placeholder for ddgs releases without the exceptions module"""
+
+import metrics
+from cache import PageCache, SQLiteCache, normalize_query
+from fetch_client import async_page_limiter, async_transport, get_session, page_scheduler
+from rate_limit import RequestGovernor
+from text_extractor import decode_html, extract_text, is_text_type, looks_binary
+
 # ---------------------------------------
 # HTTP settings
 # ---------------------------------------
@@ -16,7 +30,59 @@ HEADERS = {
 
 REQUEST_TIMEOUT = 6
 MAX_PAGE_CHARS = 3000
-SEARCH_DELAY = 0.2  # avoid DDG rate limiting
+# Downloads stop after this many bytes; only the prefix is decoded and parsed
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", str(512 * 1024)))
+# Pages declaring a larger Content-Length are not downloaded at all
+MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(5 * 1024 * 1024)))
+DOWNLOAD_CHUNK = 16384
+# DuckDuckGo calls are paced globally rather than by sleeping inside each search
+SEARCH_MIN_INTERVAL = float(os.getenv("SEARCH_MIN_INTERVAL", "1.0"))  # seconds between DDG calls
+SEARCH_MAX_WAIT = float(os.getenv("SEARCH_MAX_WAIT", "8"))  # give up rather than queue longer
+SEARCH_RATELIMIT_PENALTY = float(os.getenv("SEARCH_RATELIMIT_PENALTY", "30"))
+# Optional file that shares the pacing between worker processes on one host
+SEARCH_GOVERNOR_PATH = os.getenv("SEARCH_GOVERNOR_PATH") or None
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "4"))  # shared budget for a batch of pages
+
+# Search results are cached on disk: shared by every worker process, kept across restarts
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.db")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "5000"))
+
+# Extracted page text is cached in memory and revalidated with conditional GETs
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+PAGE_CACHE_BYTES = int(os.getenv("PAGE_CACHE_BYTES", str(8 * 1024 * 1024)))
+PAGE_CACHE_MAX_TTL = float(os.getenv("PAGE_CACHE_MAX_TTL", "86400"))  # cap on honored max-age
+
+SEARCH_SECONDS = metrics.histogram("search_web_seconds", "DuckDuckGo search latency")
+FETCH_SECONDS = metrics.histogram("fetch_page_seconds", "Page fetch + extraction latency", ("outcome",))
+FETCH_BATCH_SECONDS = metrics.histogram("fetch_pages_seconds", "Wall time of a concurrent page batch")
+FETCH_SKIPPED = metrics.counter(
+    "fetch_page_skipped_total", "Page downloads refused or abandoned", ("reason",)
+)
+SEARCH_CACHE_REQUESTS = metrics.counter(
+    "search_cache_requests_total", "Search result cache lookups by result", ("result",)
+)
+SEARCH_WAIT_SECONDS = metrics.histogram(
+    "search_governor_wait_seconds", "Time a search waited for its DuckDuckGo slot"
+)
+PAGE_CACHE_REQUESTS = metrics.counter(
+    "page_cache_requests_total", "Page cache lookups by result", ("result",)
+)
+
+search_cache = SQLiteCache(SEARCH_CACHE_PATH, max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+page_cache = PageCache(max_bytes=PAGE_CACHE_BYTES, max_ttl=PAGE_CACHE_MAX_TTL)
+search_governor = RequestGovernor(
+    SEARCH_MIN_INTERVAL, max_wait=SEARCH_MAX_WAIT, state_path=SEARCH_GOVERNOR_PATH
+)
+
+
+class SearchOverloaded(Exception):
+    """The search queue is longer than SEARCH_MAX_WAIT; try again shortly"""
+
+
+# Shared async client (created lazily on the running loop)
+_async_client = None
 
 # ---------------------------------------
 # Block low-signal / junk domains
@@ -42,12 +108,47 @@ def search_web(query: str, max_results: int = 3):
     Perform a DuckDuckGo web search and return
     a filtered list of results with title, url, and snippet.
     Reduces Wikipedia and other low-quality spam.
+    Results are served from the persistent search cache when fresh;
+    otherwise the call waits for its slot from the search governor and
+    raises SearchOverloaded if the queue is longer than SEARCH_MAX_WAIT.
     """
+    cache_key = _search_cache_key(query, max_results)
+    cached = _cached_results(cache_key)
+    if cached is not None:
+        return cached
+
+    waited = search_governor.acquire()
+    if waited is None:
+        raise SearchOverloaded("web search is busy; try again in a moment")
+    SEARCH_WAIT_SECONDS.observe(waited)
+    return _ddg_search(query, max_results, cache_key)
+
+
+def _search_cache_key(query: str, max_results: int) -> str:
+    return f"{normalize_query(query)}|{max_results}"
+
+
+def _cached_results(cache_key: str):
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    cached = search_cache.get(cache_key)
+    SEARCH_CACHE_REQUESTS.inc(result="miss" if cached is None else "hit")
+    return cached
+
+
+def _ddg_search(query: str, max_results: int, cache_key: str):
+    """The DuckDuckGo call itself; the caller already holds a due governor slot"""
     blacklist = ("wikipedia.org", "reddit.com", "quora.com")
     results = []
 
-    with DDGS() as ddgs:
-        for r in ddgs.text(query, max_results=max_results * 2):
+    with SEARCH_SECONDS.time(), DDGS() as ddgs:
+        try:
+            hits = ddgs.text(query, max_results=max_results * 2)
+        except RatelimitException:
+            search_governor.penalize(SEARCH_RATELIMIT_PENALTY)
+            raise
+
+        for r in hits:
             url = r.get("href", "")
             if not url:
                 continue
@@ -68,7 +169,9 @@ def search_web(query: str, max_results: int = 3):
             if len(results) >= max_results:
                 break
 
-            time.sleep(0.15)
+    # Empty results are often a transient DDG hiccup; don't pin them for a TTL
+    if results and SEARCH_CACHE_ENABLED:
+        search_cache.set(cache_key, results)
 
     return results
 
@@ -76,40 +179,265 @@ def search_web(query: str, max_results: int = 3):
 # ---------------------------------------
 # Page fetching + extraction
 # ---------------------------------------
+def _extract_text(html: str) -> str:
+    """Strip non-content elements and return capped readable text."""
+    # Safety cap for tokens; streaming engines stop parsing once it is reached
+    return extract_text(html, MAX_PAGE_CHARS)
+
+
+def _refuse(headers) -> bool:
+    """Skip the body when the headers already say it is not text or too big"""
+    if is_text_type(headers.get("content-type")) is False:
+        FETCH_SKIPPED.inc(reason="content_type")
+        return True
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = 0
+    if length > MAX_CONTENT_LENGTH:
+        FETCH_SKIPPED.inc(reason="too_large")
+        return True
+    return False
+
+
+def _download_done(body: bytearray, start: float) -> bool:
+    """Stop reading at the byte cap, or when the page has used its time budget"""
+    if len(body) >= MAX_PAGE_BYTES:
+        FETCH_SKIPPED.inc(reason="truncated")
+        return True
+    return time.perf_counter() - start > REQUEST_TIMEOUT
+
+
+def _page_text(body: bytes, content_type) -> str:
+    """Sniff, decode and extract the capped body of a response"""
+    body = body[:MAX_PAGE_BYTES]
+    if is_text_type(content_type) is None and looks_binary(body):
+        FETCH_SKIPPED.inc(reason="binary")
+        return ""
+    return _extract_text(decode_html(body, content_type))
+
+
+def _cached_page(url: str):
+    """Page cache entry for `url` (fresh or stale), or None"""
+    if not PAGE_CACHE_ENABLED:
+        return None
+    cached = page_cache.get(url)
+    if cached is None:
+        PAGE_CACHE_REQUESTS.inc(result="miss")
+    elif cached.fresh:
+        PAGE_CACHE_REQUESTS.inc(result="fresh")
+    return cached
+
+
+def _request_headers(cached) -> dict:
+    """Default headers, plus If-None-Match / If-Modified-Since for a stale entry"""
+    return {**HEADERS, **cached.validators()} if cached is not None else HEADERS
+
+
+def _not_modified(url: str, cached, headers) -> str:
+    """Handle a 304: the cached text is still current"""
+    PAGE_CACHE_REQUESTS.inc(result="revalidated")
+    page_cache.refresh(url, headers)
+    return cached.text
+
+
+def _store_page(url: str, cached, text: str, headers) -> None:
+    if not PAGE_CACHE_ENABLED:
+        return
+    if cached is not None:
+        PAGE_CACHE_REQUESTS.inc(result="changed")
+    page_cache.put(url, text, headers)
+
+
 def fetch_page(url: str) -> str:
     """
     Fetch a web page and extract readable text.
+    Fresh cached pages skip the network; stale ones are revalidated.
+    The body is streamed and read only up to MAX_PAGE_BYTES over the
+    shared keep-alive session.
     Returns empty string on failure.
     """
+    start = time.perf_counter()
+    cached = _cached_page(url)
+    if cached is not None and cached.fresh:
+        FETCH_SECONDS.observe(time.perf_counter() - start, outcome="cached")
+        return cached.text
+
+    text = ""
     try:
-        response = requests.get(
+        with get_session().get(
             url,
+            headers=_request_headers(cached),
+            timeout=REQUEST_TIMEOUT,
+            stream=True
+        ) as response:
+
+            if response.status_code == 304 and cached is not None:
+                text = _not_modified(url, cached, response.headers)
+            elif response.status_code == 200 and not _refuse(response.headers):
+                body = bytearray()
+                for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                    body += chunk
+                    if _download_done(body, start):
+                        break
+                text = _page_text(bytes(body), response.headers.get("content-type"))
+                _store_page(url, cached, text, response.headers)
+
+    except Exception:
+        pass
+
+    FETCH_SECONDS.observe(time.perf_counter() - start, outcome="ok" if text else "failed")
+    return text
+
+
+def fetch_pages(urls, want=None, deadline=FETCH_DEADLINE):
+    """
+    Fetch several pages concurrently under one shared deadline.
+    Returns up to `want` (url, text) pairs, in the order the urls were given,
+    taken from the first successful extractions. Stragglers are abandoned.
+    Fetches share the host-aware scheduler, so no single host gets more
+    than FETCH_PER_HOST of the workers.
+    """
+    want = want or len(urls)
+    start = time.perf_counter()
+    futures = {page_scheduler.submit(url, fetch_page, url): i for i, url in enumerate(urls)}
+    results = {}
+
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            text = future.result()
+            if text:
+                results[futures[future]] = text
+            if len(results) >= want:
+                break
+    except FuturesTimeout:
+        pass
+    finally:
+        # Queued fetches are dropped; running ones end within REQUEST_TIMEOUT
+        for future in futures:
+            future.cancel()
+        FETCH_BATCH_SECONDS.observe(time.perf_counter() - start)
+
+    ranked = sorted(results)[:want]
+    return [(urls[i], results[i]) for i in ranked]
+
+
+# ---------------------------------------
+# Async variants (used by the /ask stream)
+# ---------------------------------------
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            transport=async_transport(),
             headers=HEADERS,
-            timeout=REQUEST_TIMEOUT
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True
         )
+    return _async_client
+
 
-        if response.status_code != 200:
-            return ""
+async def aclose_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
 
-        soup = BeautifulSoup(response.text, "html.parser")
 
-        # Remove non-content elements
-        for tag in soup([
-            "script",
-            "style",
-            "nav",
-            "footer",
-            "header",
-            "noscript",
-            "aside",
-            "form"
-        ]):
-            tag.decompose()
+async def search_web_async(query: str, max_results: int = 3):
+    """
+    Async twin of search_web. The governor wait happens on the event
+    loop; DDGS has no asyncio API, so only the blocking search itself
+    (and the cache read) runs in a worker thread, once its slot is due.
+    """
+    cache_key = _search_cache_key(query, max_results)
+    cached = await asyncio.to_thread(_cached_results, cache_key)
+    if cached is not None:
+        return cached
 
-        text = " ".join(soup.stripped_strings)
+    waited = await search_governor.acquire_async()
+    if waited is None:
+        raise SearchOverloaded("web search is busy; try again in a moment")
+    SEARCH_WAIT_SECONDS.observe(waited)
+    return await asyncio.to_thread(_ddg_search, query, max_results, cache_key)
 
-        # Safety cap for tokens
-        return text[:MAX_PAGE_CHARS]
 
+async def fetch_page_async(url: str) -> str:
+    """
+    Async twin of fetch_page; waits for a per-host slot first.
+    Returns empty string on failure.
+    """
+    start = time.perf_counter()
+    cached = _cached_page(url)
+    if cached is not None and cached.fresh:
+        FETCH_SECONDS.observe(time.perf_counter() - start, outcome="cached")
+        return cached.text
+
+    text = ""
+    try:
+        async with async_page_limiter.slot(url), _get_async_client().stream(
+            "GET",
+            url,
+            headers=cached.validators() if cached is not None else None
+        ) as response:
+            began = time.perf_counter()
+
+            if response.status_code == 304 and cached is not None:
+                text = _not_modified(url, cached, response.headers)
+            elif response.status_code == 200 and not _refuse(response.headers):
+                body = bytearray()
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK):
+                    body += chunk
+                    if _download_done(body, began):
+                        break
+                # Parsing is CPU-bound; keep it off the event loop
+                text = await asyncio.to_thread(
+                    _page_text, bytes(body), response.headers.get("content-type")
+                )
+                _store_page(url, cached, text, response.headers)
+
+    except asyncio.CancelledError:
+        FETCH_SECONDS.observe(time.perf_counter() - start, outcome="cancelled")
+        raise
     except Exception:
-        return ""
+        pass
+
+    FETCH_SECONDS.observe(time.perf_counter() - start, outcome="ok" if text else "failed")
+    return text
+
+
+async def fetch_pages_async(urls, want=None, deadline=FETCH_DEADLINE):
+    """
+    Async twin of fetch_pages.
+    Returns as soon as `want` pages have been extracted (or the deadline
+    passes) and cancels the fetches that are still in flight.
+    """
+    want = want or len(urls)
+    tasks = {asyncio.ensure_future(fetch_page_async(url)): i for i, url in enumerate(urls)}
+    results = {}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    end = start + deadline
+
+    try:
+        pending = set(tasks)
+        while pending and len(results) < want:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=remaining,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                text = task.result()
+                if text:
+                    results[tasks[task]] = text
+    finally:
+        for task in tasks:
+            task.cancel()
+        FETCH_BATCH_SECONDS.observe(loop.time() - start)
+
+    ranked = sorted(results)[:want]
+    return [(urls[i], results[i]) for i in ranked]